@@ -7,6 +7,13 @@ class ComputeContext(ABC):
     def device(self):
         pass
 
+    @property
+    def inference_backend(self) -> str:
+        # How models are run for inference. One of "eager" (run the model as
+        # it is), "torchscript" (trace the model) or "compile" (compile the
+        # model with torch.compile).
+        return "eager"
+
     def train(self, run_name):
         # A helper method to run train in some other context.
         # This can be on a cluster, in a cloud, through bsub,
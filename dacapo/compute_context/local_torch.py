@@ -15,6 +15,21 @@ class LocalTorch(ComputeContext):
             "If undefined we will use 'cuda' if possible or fall back on 'cpu'."
         },
     )
+    _inference_backend: str = attr.ib(
+        default="eager",
+        validator=attr.validators.in_(["eager", "torchscript", "compile"]),
+        metadata={
+            "help_text": "How to run models for inference. One of: 'eager', "
+            "'torchscript', 'compile'. 'eager' runs the model as it is, "
+            "'torchscript' traces the model once per input shape (traced models "
+            "are cached next to the checkpoint they were created from), "
+            "'compile' compiles the model with torch.compile."
+        },
+    )
+
+    @property
+    def inference_backend(self):
+        return self._inference_backend
 
     @property
     def device(self):
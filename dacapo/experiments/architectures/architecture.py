@@ -3,6 +3,7 @@ from funlib.geometry import Coordinate
 import torch
 
 from abc import ABC, abstractmethod
+from typing import Optional
 
 
 class Architecture(torch.nn.Module, ABC):
@@ -38,3 +39,10 @@ class Architecture(torch.nn.Module, ABC):
 
     def scale(self, input_voxel_size: Coordinate) -> Coordinate:
         return input_voxel_size
+
+    def compute_output_shape(self, input_shape: Coordinate) -> Optional[Coordinate]:
+        """Compute the spatial output shape of this architecture for the given
+        spatial input shape, without running the architecture. Returns
+        ``None`` if this is not supported, in which case the shape has to be
+        found by running a forward pass."""
+        return None
@@ -1,5 +1,7 @@
 from .architecture import Architecture
 
+from funlib.geometry import Coordinate
+
 import torch
 import torch.nn as nn
 
@@ -93,6 +95,16 @@ class CNNectomeUNet(Architecture):
             voxel_size = voxel_size / upsample_factor
         return voxel_size
 
+    def compute_output_shape(self, input_shape):
+        if len(self.upsample_factors) > 0:
+            unet, *layers = self.unet
+        else:
+            unet, layers = self.unet, []
+        shape = unet.compute_output_shape(input_shape)
+        for layer in layers:
+            shape = layer.compute_output_shape(shape)
+        return Coordinate(shape)
+
     @property
     def input_shape(self):
         return self._input_shape
@@ -369,6 +381,27 @@ class CNNectomeUNetModule(torch.nn.Module):
 
         return fs_out
 
+    def rec_compute_output_shape(self, level, f_in):
+        # mirrors rec_forward, for the first head
+        i = self.num_levels - level - 1
+
+        f_left = self.l_conv[i].compute_output_shape(f_in)
+
+        if level == 0:
+            return f_left
+
+        g_in = self.l_down[i].compute_output_shape(f_left)
+        g_out = self.rec_compute_output_shape(level - 1, g_in)
+        f_right = self.r_up[0][i].compute_output_shape(g_out)
+
+        return self.r_conv[0][i].compute_output_shape(f_right)
+
+    def compute_output_shape(self, input_shape):
+        """Compute the spatial output shape for the given spatial input shape,
+        without running the U-Net."""
+
+        return self.rec_compute_output_shape(self.num_levels - 1, tuple(input_shape))
+
     def forward(self, x):
         y = self.rec_forward(self.num_levels - 1, x)
 
@@ -387,6 +420,9 @@ class ConvPass(torch.nn.Module):
         if activation is not None:
             activation = getattr(torch.nn, activation)
 
+        self.kernel_sizes = kernel_sizes
+        self.padding = padding
+
         layers = []
 
         for kernel_size in kernel_sizes:
@@ -414,6 +450,18 @@ class ConvPass(torch.nn.Module):
 
         self.conv_pass = torch.nn.Sequential(*layers)
 
+    def compute_output_shape(self, input_shape):
+        shape = tuple(input_shape)
+        for kernel_size in self.kernel_sizes:
+            if self.padding == "same":
+                # even kernel sizes grow the shape by one
+                shape = tuple(
+                    s + 2 * (k // 2) - k + 1 for s, k in zip(shape, kernel_size)
+                )
+            else:
+                shape = tuple(s - k + 1 for s, k in zip(shape, kernel_size))
+        return shape
+
     def forward(self, x):
         return self.conv_pass(x)
 
@@ -433,6 +481,15 @@ class Downsample(torch.nn.Module):
 
         self.down = pool(downsample_factor, stride=downsample_factor)
 
+    def compute_output_shape(self, input_shape):
+        for d, (s, f) in enumerate(zip(input_shape, self.downsample_factor)):
+            if s % f != 0:
+                raise RuntimeError(
+                    "Can not downsample shape %s with factor %s, mismatch "
+                    "in spatial dimension %d" % (input_shape, self.downsample_factor, d)
+                )
+        return tuple(s // f for s, f in zip(input_shape, self.downsample_factor))
+
     def forward(self, x):
         for d in range(1, self.dims + 1):
             if x.size()[-d] % self.downsample_factor[-d] != 0:
@@ -464,6 +521,7 @@ class Upsample(torch.nn.Module):
             next_conv_kernel_sizes is None
         ), "crop_factor and next_conv_kernel_sizes have to be given together"
 
+        self.scale_factor = scale_factor
         self.crop_factor = crop_factor
         self.next_conv_kernel_sizes = next_conv_kernel_sizes
 
@@ -502,6 +560,30 @@ class Upsample(torch.nn.Module):
         else:
             self.up = layers[0]
 
+    def compute_output_shape(self, input_shape):
+        shape = tuple(s * f for s, f in zip(input_shape, self.scale_factor))
+
+        if self.next_conv_kernel_sizes is not None:
+            # see crop_to_factor
+            convolution_crop = tuple(
+                sum(ks[d] - 1 for ks in self.next_conv_kernel_sizes)
+                for d in range(self.dims)
+            )
+            target_shape = tuple(
+                int(math.floor(float(s - c) / f)) * f + c
+                for s, c, f in zip(shape, convolution_crop, self.crop_factor)
+            )
+            if target_shape != shape:
+                assert all((t > c) for t, c in zip(target_shape, convolution_crop)), (
+                    "Feature map with shape %s is too small to ensure "
+                    "translation equivariance with factor %s and following "
+                    "convolutions %s"
+                    % (shape, self.crop_factor, self.next_conv_kernel_sizes)
+                )
+            shape = target_shape
+
+        return shape
+
     def crop_to_factor(self, x, factor, kernel_sizes):
         """Crop feature maps to ensure translation equivariance with stride of
         upsampling factor. This should be done right after upsampling, before
@@ -53,6 +53,9 @@ class NumpyArray(Array):
         instance._axes = axes
         return instance
 
+    def __setitem__(self, roi: Roi, value: np.ndarray):
+        self.data[tuple(self._slices(roi))] = value
+
     @property
     def axes(self):
         return self._axes
@@ -81,8 +81,18 @@ class ZarrArray(Array):
 
     @property
     def dtype(self) -> Any:
+        if self._value_scale is not None:
+            return np.dtype(np.float32)
         return self.data.dtype
 
+    @lazy_property.LazyProperty
+    def _value_scale(self) -> Optional[Tuple[float, float]]:
+        """The ``(scale_factor, add_offset)`` of arrays that store floats as
+        scaled integers, ``None`` for arrays that store values as they are."""
+        if "scale_factor" not in self._attributes:
+            return None
+        return (self._attributes["scale_factor"], self._attributes["add_offset"])
+
     @property
     def num_channels(self) -> Optional[int]:
         return None if "c" not in self.axes else self.data.shape[self.axes.index("c")]
@@ -100,11 +110,27 @@ class ZarrArray(Array):
         data: np.ndarray = funlib.persistence.Array(
             self.data, self.roi, self.voxel_size
         ).to_ndarray(roi=roi)
+        if self._value_scale is not None:
+            scale, offset = self._value_scale
+            data = data.astype(np.float32)
+            data *= scale
+            data += offset
         return data
 
     def __setitem__(self, roi: Roi, value: np.ndarray):
+        if self._value_scale is not None:
+            value = self._quantize(value)
         funlib.persistence.Array(self.data, self.roi, self.voxel_size)[roi] = value
 
+    def _quantize(self, value: np.ndarray) -> np.ndarray:
+        scale, offset = self._value_scale
+        dtype = self.data.dtype
+        quantized = np.asarray(value, dtype=np.float32) - offset
+        quantized /= scale
+        np.rint(quantized, out=quantized)
+        np.clip(quantized, np.iinfo(dtype).min, np.iinfo(dtype).max, out=quantized)
+        return quantized.astype(dtype)
+
     @classmethod
     def create_from_array_identifier(
         cls,
@@ -116,10 +142,22 @@ class ZarrArray(Array):
         dtype,
         write_size=None,
         name=None,
+        value_range=None,
+        overwrite=True,
     ):
         """
         Create a new ZarrArray given an array identifier. It is assumed that
         this array_identifier points to a dataset that does not yet exist
+
+        If a ``value_range`` is given, ``dtype`` has to be an integer type.
+        Values in that range are then stored as integers scaled to the full
+        range of ``dtype``, with the ``scale_factor`` and ``add_offset``
+        needed to decode them stored in the dataset's attributes. Reading from
+        the array returns the decoded float32 values.
+
+        If the dataset already exists, it is reset to zeros unless
+        ``overwrite`` is ``False``, in which case its content is kept (e.g.,
+        to resume writing to it).
         """
         if write_size is None:
             # total storage per block is approx c*x*y*z*dtype_size
@@ -136,7 +174,28 @@ class ZarrArray(Array):
             write_size = Coordinate((axis_length,) * voxel_size.dims) * voxel_size
         write_size = Coordinate((min(a, b) for a, b in zip(write_size, roi.shape)))
         zarr_container = zarr.open(array_identifier.container, "a")
-        try:
+        if array_identifier.dataset in zarr_container:
+            # ``prepare_ds`` reuses compatible existing datasets, so they have
+            # to be checked (and reset) here
+            zarr_dataset = zarr_container[array_identifier.dataset]
+            assert (
+                tuple(zarr_dataset.attrs["offset"]) == roi.offset
+            ), f"{zarr_dataset.attrs['offset']}, {roi.offset}"
+            assert (
+                tuple(zarr_dataset.attrs["resolution"]) == voxel_size
+            ), f"{zarr_dataset.attrs['resolution']}, {voxel_size}"
+            assert tuple(zarr_dataset.attrs["axes"]) == tuple(
+                axes
+            ), f"{zarr_dataset.attrs['axes']}, {axes}"
+            assert (
+                zarr_dataset.shape
+                == ((num_channels,) if num_channels is not None else ())
+                + roi.shape / voxel_size
+            ), f"{zarr_dataset.shape}, {((num_channels,) if num_channels is not None else ()) + roi.shape / voxel_size}"
+            if overwrite:
+                # written chunk by chunk, without a full-size array of zeros
+                zarr_dataset[...] = 0
+        else:
             funlib.persistence.prepare_ds(
                 f"{array_identifier.container}",
                 array_identifier.dataset,
@@ -160,23 +219,18 @@ class ZarrArray(Array):
             zarr_dataset.attrs["axes"] = (
                 axes[::-1] if array_identifier.container.name.endswith("n5") else axes
             )
-        except zarr.errors.ContainsArrayError:
-            zarr_dataset = zarr_container[array_identifier.dataset]
-            assert (
-                tuple(zarr_dataset.attrs["offset"]) == roi.offset
-            ), f"{zarr_dataset.attrs['offset']}, {roi.offset}"
-            assert (
-                tuple(zarr_dataset.attrs["resolution"]) == voxel_size
-            ), f"{zarr_dataset.attrs['resolution']}, {voxel_size}"
-            assert tuple(zarr_dataset.attrs["axes"]) == tuple(
-                axes
-            ), f"{zarr_dataset.attrs['axes']}, {axes}"
-            assert (
-                zarr_dataset.shape
-                == ((num_channels,) if num_channels is not None else ())
-                + roi.shape / voxel_size
-            ), f"{zarr_dataset.shape}, {((num_channels,) if num_channels is not None else ()) + roi.shape / voxel_size}"
-            zarr_dataset[:] = np.zeros(zarr_dataset.shape, dtype)
+
+        if value_range is not None:
+            assert np.issubdtype(
+                dtype, np.integer
+            ), f"Can only scale values to integer types, not {dtype}"
+            low, high = value_range
+            zarr_dataset.attrs["scale_factor"] = (high - low) / np.iinfo(dtype).max
+            zarr_dataset.attrs["add_offset"] = low
+        else:
+            for key in ("scale_factor", "add_offset"):
+                if key in zarr_dataset.attrs:
+                    del zarr_dataset.attrs[key]
 
         zarr_array = cls.__new__(cls)
         zarr_array.file_name = array_identifier.container
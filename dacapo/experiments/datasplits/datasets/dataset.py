@@ -15,6 +15,9 @@ class Dataset(ABC):
 
     sample_points: Optional[List[Coordinate]]
 
+    # the config this dataset was created from
+    config: Any
+
     def __eq__(self, other: Any) -> bool:
         return isinstance(other, type(self)) and self.name == other.name
 
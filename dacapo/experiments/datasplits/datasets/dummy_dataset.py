@@ -8,4 +8,5 @@ class DummyDataset(Dataset):
     def __init__(self, dataset_config):
         super().__init__()
         self.name = dataset_config.name
+        self.config = dataset_config
         self.raw = dataset_config.raw_config.array_type(dataset_config.raw_config)
@@ -4,7 +4,7 @@ from funlib.geometry import Coordinate
 
 import torch
 
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
 
 class Model(torch.nn.Module):
@@ -15,6 +15,10 @@ class Model(torch.nn.Module):
     is in eval mode. This is particularly useful if you want to train with something
     like BCELossWithLogits, since you want to avoid applying softmax while training,
     but apply it during evaluation.
+
+    If the values predicted in eval mode are known to lie in a bounded range,
+    it can be given as ``output_range``. This allows predictions to be stored
+    as scaled integers.
     """
 
     num_out_channels: int
@@ -25,6 +29,7 @@ class Model(torch.nn.Module):
         architecture: Architecture,
         prediction_head: torch.nn.Module,
         eval_activation: torch.nn.Module = None,
+        output_range: Optional[Tuple[float, float]] = None,
     ):
         super().__init__()
 
@@ -35,10 +40,12 @@ class Model(torch.nn.Module):
 
         self.input_shape = architecture.input_shape
         self.eval_input_shape = self.input_shape + architecture.eval_shape_increase
+        self._output_shapes: Dict[Coordinate, Tuple[int, Coordinate]] = {}
         self.num_out_channels, self.output_shape = self.compute_output_shape(
             self.input_shape
         )
         self.eval_activation = eval_activation
+        self.output_range = output_range
 
     def forward(self, x):
         result = self.chain(x)
@@ -46,12 +53,49 @@ class Model(torch.nn.Module):
             result = self.eval_activation(result)
         return result
 
-    def compute_output_shape(self, input_shape: Coordinate) -> Coordinate:
-        """Compute the spatial shape (i.e., not accounting for channels and
-        batch dimensions) of this model, when fed a tensor of the given spatial
-        shape as input."""
-
-        return self.__get_output_shape(input_shape, self.num_in_channels)
+    def compute_output_shape(self, input_shape: Coordinate) -> Tuple[int, Coordinate]:
+        """Compute the number of output channels and the spatial shape (i.e.,
+        not accounting for channels and batch dimensions) of this model, when
+        fed a tensor of the given spatial shape as input.
+
+        The shape is computed analytically if the architecture and prediction
+        head support it, otherwise by running the model on a dummy input.
+        Results are cached per input shape."""
+
+        input_shape = Coordinate(input_shape)
+        if input_shape not in self._output_shapes:
+            output_shape = self.__compute_output_shape(input_shape)
+            if output_shape is None:
+                output_shape = self.__get_output_shape(
+                    input_shape, self.num_in_channels
+                )
+            self._output_shapes[input_shape] = output_shape
+        return self._output_shapes[input_shape]
+
+    def __compute_output_shape(
+        self, input_shape: Coordinate
+    ) -> Optional[Tuple[int, Coordinate]]:
+        shape = self.architecture.compute_output_shape(input_shape)
+        head = self.prediction_head
+        if (
+            shape is None
+            or not isinstance(head, torch.nn.modules.conv._ConvNd)
+            or head.transposed
+        ):
+            return None
+
+        if isinstance(head.padding, str):
+            if head.padding == "same":
+                return head.out_channels, Coordinate(shape)
+            padding: Tuple[int, ...] = (0,) * shape.dims
+        else:
+            padding = head.padding
+        return head.out_channels, Coordinate(
+            (s + 2 * p - d * (k - 1) - 1) // st + 1
+            for s, p, d, k, st in zip(
+                shape, padding, head.dilation, head.kernel_size, head.stride
+            )
+        )
 
     def __get_output_shape(
         self, input_shape: Coordinate, in_channels: int
@@ -9,11 +9,16 @@ from .model import Model
 
 import torch
 
+from typing import List, Optional
+
 
 class Run:
     name: str
     train_until: int
     validation_interval: int
+    fast_validation_fraction: Optional[float]
+    fast_validation_seed: int
+    validation_metrics: Optional[List[str]]
 
     task: Task
     architecture: Architecture
@@ -30,6 +35,9 @@ class Run:
         self.name = run_config.name
         self.train_until = run_config.num_iterations
         self.validation_interval = run_config.validation_interval
+        self.fast_validation_fraction = run_config.fast_validation_fraction
+        self.fast_validation_seed = run_config.fast_validation_seed
+        self.validation_metrics = run_config.validation_metrics
 
         # config types
         task_type = run_config.task_config.task_type
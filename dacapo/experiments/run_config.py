@@ -6,7 +6,7 @@ from .tasks import TaskConfig
 from .trainers import TrainerConfig
 from .starts import StartConfig
 
-from typing import Optional
+from typing import List, Optional
 
 
 @attr.s
@@ -64,6 +64,32 @@ class RunConfig:
         default=1000, metadata={"help_text": "How often to perform validation."}
     )
 
+    fast_validation_fraction: Optional[float] = attr.ib(
+        default=None,
+        metadata={
+            "help_text": "If given, iterations before the last one are first "
+            "validated on a random subset of the validation datasets, covering "
+            "about this fraction of them. Only iterations that improve on the "
+            "best scores on this subset are validated on the whole datasets."
+        },
+    )
+    fast_validation_seed: int = attr.ib(
+        default=0,
+        metadata={
+            "help_text": "The random seed used to select the subset for fast "
+            "validation. The subset is the same for every iteration."
+        },
+    )
+    validation_metrics: Optional[List[str]] = attr.ib(
+        default=None,
+        metadata={
+            "help_text": "If given, validation only computes the task's criteria "
+            "and these metrics, all other metrics are reported as NaN. Expensive "
+            "metrics (e.g., distance based ones) are then only computed when "
+            "requested. By default, all metrics are computed."
+        },
+    )
+
     start_config: Optional[StartConfig] = attr.ib(
         default=None, metadata={"help_text": "A starting point for continued training."}
     )
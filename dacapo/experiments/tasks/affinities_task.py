@@ -15,5 +15,9 @@ class AffinitiesTask(Task):
             neighborhood=task_config.neighborhood, lsds=task_config.lsds
         )
         self.loss = AffinitiesLoss(len(task_config.neighborhood), task_config.lsds_to_affs_weight_ratio)
-        self.post_processor = WatershedPostProcessor(offsets=task_config.neighborhood)
+        self.post_processor = WatershedPostProcessor(
+            offsets=task_config.neighborhood,
+            block_shape=task_config.post_processing_block_shape,
+            num_workers=task_config.post_processing_num_workers,
+        )
         self.evaluator = InstanceEvaluator()
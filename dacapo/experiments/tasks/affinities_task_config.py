@@ -5,7 +5,7 @@ from .task_config import TaskConfig
 
 from funlib.geometry import Coordinate
 
-from typing import List
+from typing import List, Optional
 
 
 @attr.s
@@ -36,3 +36,19 @@ class AffinitiesTaskConfig(TaskConfig):
             "help_text": "If training with lsds, set how much they should be weighted compared to affs."
         },
     )
+    post_processing_block_shape: Optional[Coordinate] = attr.ib(
+        default=None,
+        metadata={
+            "help_text": "If given, the watershed post-processing agglomerates blocks "
+            "of this shape (in voxels) separately, with enough context for the "
+            "neighborhood, and stitches them into one segmentation. This allows "
+            "post-processing volumes that do not fit into memory."
+        },
+    )
+    post_processing_num_workers: int = attr.ib(
+        default=1,
+        metadata={
+            "help_text": "The number of processes used to agglomerate blocks in "
+            "parallel, if a post_processing_block_shape is given."
+        },
+    )
@@ -1,25 +1,57 @@
-from dacapo.utils.voi import voi
+from dacapo.utils.voi import split_vi
 from .evaluator import Evaluator
+from .blockwise import (
+    DistanceStatistics,
+    bounded_distances_to_foreground,
+    distances_to_foreground,
+    roi_blocks,
+    take_channel,
+)
 from .binary_segmentation_evaluation_scores import (
     BinarySegmentationEvaluationScores,
     MultiChannelBinarySegmentationEvaluationScores,
 )
 
-from dacapo.experiments.datasplits.datasets.arrays import ZarrArray
+from dacapo.experiments.datasplits.datasets.arrays import Array, ZarrArray
 
 import numpy as np
-import SimpleITK as sitk
 import lazy_property
 import scipy
+import scipy.sparse as sparse
 
 import itertools
 import logging
-from typing import List
+from typing import List, Optional, Set
 
 logger = logging.getLogger(__name__)
 
 BG = 0
 
+# metrics that need the distances between the segmentations
+DISTANCE_METRICS = {
+    "hausdorff",
+    "false_negative_rate_with_tolerance",
+    "false_positive_rate_with_tolerance",
+    "mean_false_distance",
+    "mean_false_negative_distance",
+    "mean_false_positive_distance",
+    "mean_false_distance_clipped",
+    "mean_false_negative_distance_clipped",
+    "mean_false_positive_distance_clipped",
+    "precision_with_tolerance",
+    "recall_with_tolerance",
+    "f1_score_with_tolerance",
+}
+
+# distance metrics that need distances larger than the clip and tolerance
+# distances
+UNBOUNDED_DISTANCE_METRICS = {
+    "hausdorff",
+    "mean_false_distance",
+    "mean_false_negative_distance",
+    "mean_false_positive_distance",
+}
+
 
 class BinarySegmentationEvaluator(Evaluator):
     """
@@ -37,8 +69,32 @@ class BinarySegmentationEvaluator(Evaluator):
             for channel, criteria in itertools.product(channels, self.criteria)
         ]
 
+    def required_metrics(self) -> Optional[Set[str]]:
+        # metrics are computed for all channels, a metric can be requested
+        # with or without the channel prefix
+        metrics = super().required_metrics()
+        if metrics is None:
+            return None
+        return set(metric.split("__")[-1] for metric in metrics)
+
+    def _max_distance(self) -> Optional[float]:
+        """The largest distance needed for the required metrics, ``None`` if
+        distances have to be exact."""
+        metrics = self.required_metrics()
+        if metrics is None or metrics & UNBOUNDED_DISTANCE_METRICS:
+            return None
+        return max(self.clip_distance, self.tol_distance)
+
     def evaluate(self, output_array_identifier, evaluation_array):
-        output_array = ZarrArray.open_from_array_identifier(output_array_identifier)
+        # the output is either given as an array or the identifier of a stored
+        # array
+        output_array = (
+            output_array_identifier
+            if isinstance(output_array_identifier, Array)
+            else ZarrArray.open_from_array_identifier(output_array_identifier)
+        )
+        if self.block_size is not None or self.rois is not None:
+            return self._evaluate_blockwise(output_array, evaluation_array)
         evaluation_data = evaluation_array[evaluation_array.roi]
         output_data = output_array[output_array.roi]
         logger.info(
@@ -59,79 +115,30 @@ class BinarySegmentationEvaluator(Evaluator):
                 evaluator = ArrayEvaluator(
                     evaluation_channel_data,
                     output_channel_data,
-                    not evaluation_channel_data.any(),
-                    not output_channel_data.any(),
                     metric_params={
                         "clip_distance": self.clip_distance,
                         "tol_distance": self.tol_distance,
                     },
                     resolution=evaluation_array.voxel_size,
+                    max_distance=self._max_distance(),
                 )
                 score_dict.append(
-                    (
-                        f"{channel}",
-                        BinarySegmentationEvaluationScores(
-                            dice=evaluator.dice(),
-                            jaccard=evaluator.jaccard(),
-                            hausdorff=evaluator.hausdorff(),
-                            false_negative_rate=evaluator.false_negative_rate(),
-                            false_negative_rate_with_tolerance=evaluator.false_negative_rate_with_tolerance(),
-                            false_positive_rate=evaluator.false_positive_rate(),
-                            false_discovery_rate=evaluator.false_discovery_rate(),
-                            false_positive_rate_with_tolerance=evaluator.false_positive_rate_with_tolerance(),
-                            voi=evaluator.voi(),
-                            mean_false_distance=evaluator.mean_false_distance(),
-                            mean_false_negative_distance=evaluator.mean_false_negative_distance(),
-                            mean_false_positive_distance=evaluator.mean_false_positive_distance(),
-                            mean_false_distance_clipped=evaluator.mean_false_distance_clipped(),
-                            mean_false_negative_distance_clipped=evaluator.mean_false_negative_distance_clipped(),
-                            mean_false_positive_distance_clipped=evaluator.mean_false_positive_distance_clipped(),
-                            precision_with_tolerance=evaluator.precision_with_tolerance(),
-                            recall_with_tolerance=evaluator.recall_with_tolerance(),
-                            f1_score_with_tolerance=evaluator.f1_score_with_tolerance(),
-                            precision=evaluator.precision(),
-                            recall=evaluator.recall(),
-                            f1_score=evaluator.f1_score(),
-                        ),
-                    )
+                    (f"{channel}", _scores(evaluator, self.required_metrics()))
                 )
             return MultiChannelBinarySegmentationEvaluationScores(score_dict)
 
         else:
-            evaluator = Evaluator(
+            evaluator = ArrayEvaluator(
                 evaluation_data,
                 output_data,
-                not evaluation_data.any(),
-                not output_data.any(),
                 metric_params={
                     "clip_distance": self.clip_distance,
                     "tol_distance": self.tol_distance,
                 },
                 resolution=evaluation_array.voxel_size,
+                max_distance=self._max_distance(),
             )
-            return BinarySegmentationEvaluationScores(
-                dice=evaluator.dice(),
-                jaccard=evaluator.jaccard(),
-                hausdorff=evaluator.hausdorff(),
-                false_negative_rate=evaluator.false_negative_rate(),
-                false_negative_rate_with_tolerance=evaluator.false_negative_rate_with_tolerance(),
-                false_positive_rate=evaluator.false_positive_rate(),
-                false_discovery_rate=evaluator.false_discovery_rate(),
-                false_positive_rate_with_tolerance=evaluator.false_positive_rate_with_tolerance(),
-                voi=evaluator.voi(),
-                mean_false_distance=evaluator.mean_false_distance(),
-                mean_false_negative_distance=evaluator.mean_false_negative_distance(),
-                mean_false_positive_distance=evaluator.mean_false_positive_distance(),
-                mean_false_distance_clipped=evaluator.mean_false_distance_clipped(),
-                mean_false_negative_distance_clipped=evaluator.mean_false_negative_distance_clipped(),
-                mean_false_positive_distance_clipped=evaluator.mean_false_positive_distance_clipped(),
-                precision_with_tolerance=evaluator.precision_with_tolerance(),
-                recall_with_tolerance=evaluator.recall_with_tolerance(),
-                f1_score_with_tolerance=evaluator.f1_score_with_tolerance(),
-                precision=evaluator.precision(),
-                recall=evaluator.recall(),
-                f1_score=evaluator.f1_score(),
-            )
+            return _scores(evaluator, self.required_metrics())
 
     @property
     def score(self):
@@ -141,92 +148,184 @@ class BinarySegmentationEvaluator(Evaluator):
         return MultiChannelBinarySegmentationEvaluationScores(channel_scores)
 
     def _evaluate(self, output_data, evaluation_data, voxel_size):
-        evaluator = Evaluator(
+        evaluator = ArrayEvaluator(
             evaluation_data,
             output_data,
-            not evaluation_data.any(),
-            not output_data.any(),
             metric_params={
                 "clip_distance": self.clip_distance,
                 "tol_distance": self.tol_distance,
             },
             resolution=voxel_size,
+            max_distance=self._max_distance(),
         )
-        return BinarySegmentationEvaluationScores(
-            dice=evaluator.dice(),
-            jaccard=evaluator.jaccard(),
-            hausdorff=evaluator.hausdorff(),
-            false_negative_rate=evaluator.false_negative_rate(),
-            false_negative_rate_with_tolerance=evaluator.false_negative_rate_with_tolerance(),
-            false_positive_rate=evaluator.false_positive_rate(),
-            false_discovery_rate=evaluator.false_discovery_rate(),
-            false_positive_rate_with_tolerance=evaluator.false_positive_rate_with_tolerance(),
-            voi=evaluator.voi(),
-            mean_false_distance=evaluator.mean_false_distance(),
-            mean_false_negative_distance=evaluator.mean_false_negative_distance(),
-            mean_false_positive_distance=evaluator.mean_false_positive_distance(),
-            mean_false_distance_clipped=evaluator.mean_false_distance_clipped(),
-            mean_false_negative_distance_clipped=evaluator.mean_false_negative_distance_clipped(),
-            mean_false_positive_distance_clipped=evaluator.mean_false_positive_distance_clipped(),
-            precision_with_tolerance=evaluator.precision_with_tolerance(),
-            recall_with_tolerance=evaluator.recall_with_tolerance(),
-            f1_score_with_tolerance=evaluator.f1_score_with_tolerance(),
-            precision=evaluator.precision(),
-            recall=evaluator.recall(),
-            f1_score=evaluator.f1_score(),
+        return _scores(evaluator, self.required_metrics())
+
+    def _evaluate_blockwise(self, output_array, evaluation_array):
+        """Evaluate in blocks of ``self.block_size`` (of ``self.rois``, if
+        given), holding only a block (and the halo needed for distances) in
+        memory at a time."""
+        rois = self.rois if self.rois is not None else [evaluation_array.roi]
+        voxel_size = evaluation_array.voxel_size
+        metric_params = {
+            "clip_distance": self.clip_distance,
+            "tol_distance": self.tol_distance,
+        }
+        channels = (
+            list(range(len(evaluation_array.channels)))
+            if "c" in evaluation_array.axes
+            else [None]
         )
+        evaluators = [
+            BlockwiseArrayEvaluator(metric_params, voxel_size) for _ in channels
+        ]
 
+        # first pass: count the overlaps of the segmentations
+        for _, block in roi_blocks(rois, self.block_size, voxel_size):
+            evaluation_data = evaluation_array[block]
+            output_data = output_array[block]
+            for channel, evaluator in zip(channels, evaluators):
+                evaluator.add_overlaps(
+                    take_channel(evaluation_data, evaluation_array, channel),
+                    take_channel(output_data, output_array, channel),
+                )
 
-class ArrayEvaluator:
-    def __init__(
-        self,
-        truth_binary,
-        test_binary,
-        truth_empty,
-        test_empty,
-        metric_params,
-        resolution,
-    ):
-        self.truth = truth_binary.astype(np.uint8)
-        self.test = test_binary.astype(np.uint8)
-        self.truth_empty = truth_empty
-        self.test_empty = test_empty
-        self.cremieval = CremiEvaluator(
-            truth_binary,
-            test_binary,
-            sampling=resolution,
-            clip_distance=metric_params["clip_distance"],
-            tol_distance=metric_params["tol_distance"],
+        # second pass: distances between the segmentations, only needed if
+        # neither of them is empty and a distance metric is requested
+        metrics = self.required_metrics()
+        if metrics is None or metrics & DISTANCE_METRICS:
+            halo = max(self.clip_distance, self.tol_distance)
+            bounded = self._max_distance() is not None
+            for roi, block in roi_blocks(rois, self.block_size, voxel_size):
+                evaluation_data = evaluation_array[block]
+                output_data = output_array[block]
+                for channel, evaluator in zip(channels, evaluators):
+                    if evaluator.truth_empty or evaluator.test_empty:
+                        continue
+                    evaluator.false_positive_distances.add(
+                        distances_to_foreground(
+                            evaluation_array,
+                            roi,
+                            block,
+                            take_channel(output_data, output_array, channel) != BG,
+                            halo,
+                            channel,
+                            bounded,
+                        )
+                    )
+                    evaluator.false_negative_distances.add(
+                        distances_to_foreground(
+                            output_array,
+                            roi,
+                            block,
+                            take_channel(evaluation_data, evaluation_array, channel)
+                            != BG,
+                            halo,
+                            channel,
+                            bounded,
+                        )
+                    )
+
+        if channels == [None]:
+            return _scores(evaluators[0], metrics)
+        return MultiChannelBinarySegmentationEvaluationScores(
+            [
+                (f"{channel}", _scores(evaluator, metrics))
+                for channel, evaluator in zip(evaluation_array.channels, evaluators)
+            ]
         )
+
+
+def _scores(
+    evaluator, metrics: Optional[Set[str]] = None
+) -> BinarySegmentationEvaluationScores:
+    """Compute the given ``metrics`` (all, if ``None``), the others are left
+    as NaN."""
+    return BinarySegmentationEvaluationScores(
+        **{
+            metric: getattr(evaluator, metric)()
+            for metric in BinarySegmentationEvaluationScores.criteria
+            if metrics is None or metric in metrics
+        }
+    )
+
+
+class BinarySegmentationMetrics:
+    """Computes binary segmentation metrics from the overlaps of a test and a
+    truth segmentation (the number of voxels by test and truth label) and
+    statistics of the distances of their false positives and false negatives
+    to the other segmentation. Subclasses provide the distance statistics as
+    ``false_positive_distances`` and ``false_negative_distances``."""
+
+    false_positive_distances: DistanceStatistics
+    false_negative_distances: DistanceStatistics
+
+    def __init__(self, metric_params, resolution):
+        self.clip_distance = metric_params["clip_distance"]
+        self.tol_distance = metric_params["tol_distance"]
         self.resolution = resolution
+        # number of voxels by test (rows) and truth (columns) label
+        self.overlaps = np.zeros((2, 2), dtype=np.int64)
+
+    def add_overlaps(self, truth, test):
+        truth = truth != BG
+        test = test != BG
+        true_positives = np.count_nonzero(np.logical_and(truth, test))
+        truth_positives = np.count_nonzero(truth)
+        test_positives = np.count_nonzero(test)
+        self.overlaps += np.array(
+            [
+                [
+                    truth.size - truth_positives - test_positives + true_positives,
+                    truth_positives - true_positives,
+                ],
+                [test_positives - true_positives, true_positives],
+            ]
+        )
 
-    @lazy_property.LazyProperty
-    def truth_itk(self):
-        res = sitk.GetImageFromArray(self.truth)
-        res.SetSpacing(self.resolution)
-        return res
+    @property
+    def true_positives(self):
+        return self.overlaps[1, 1]
 
-    @lazy_property.LazyProperty
-    def test_itk(self):
-        res = sitk.GetImageFromArray(self.test)
-        res.SetSpacing(self.resolution)
-        return res
+    @property
+    def false_positives(self):
+        return self.overlaps[1, 0]
 
-    @lazy_property.LazyProperty
-    def overlap_measures_filter(self):
-        overlap_measures_filter = sitk.LabelOverlapMeasuresImageFilter()
-        overlap_measures_filter.Execute(self.test_itk, self.truth_itk)
-        return overlap_measures_filter
+    @property
+    def false_negatives(self):
+        return self.overlaps[0, 1]
+
+    @property
+    def true_negatives(self):
+        return self.overlaps[0, 0]
+
+    @property
+    def truth_empty(self):
+        return self.true_positives + self.false_negatives == 0
+
+    @property
+    def test_empty(self):
+        return self.true_positives + self.false_positives == 0
 
     def dice(self):
         if (not self.truth_empty) or (not self.test_empty):
-            return self.overlap_measures_filter.GetDiceCoefficient()
+            return float(
+                2
+                * self.true_positives
+                / (
+                    2 * self.true_positives
+                    + self.false_positives
+                    + self.false_negatives
+                )
+            )
         else:
             return np.nan
 
     def jaccard(self):
         if (not self.truth_empty) or (not self.test_empty):
-            return self.overlap_measures_filter.GetJaccardCoefficient()
+            return float(
+                self.true_positives
+                / (self.true_positives + self.false_positives + self.false_negatives)
+            )
         else:
             return np.nan
 
@@ -234,9 +333,9 @@ class ArrayEvaluator:
         if self.truth_empty and self.test_empty:
             return 0
         elif not self.truth_empty and not self.test_empty:
-            hausdorff_distance_filter = sitk.HausdorffDistanceImageFilter()
-            hausdorff_distance_filter.Execute(self.test_itk, self.truth_itk)
-            return hausdorff_distance_filter.GetHausdorffDistance()
+            return max(
+                self.false_positive_distances.max, self.false_negative_distances.max
+            )
         else:
             return np.nan
 
@@ -244,19 +343,26 @@ class ArrayEvaluator:
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.overlap_measures_filter.GetFalseNegativeError()
+            return float(
+                self.false_negatives / (self.true_positives + self.false_negatives)
+            )
 
     def false_positive_rate(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return (self.false_discovery_rate() * np.sum(self.test != 0)) / np.sum(
-                self.truth == 0
-            )
+            return (
+                self.false_discovery_rate()
+                * (self.true_positives + self.false_positives)
+            ) / (self.false_positives + self.true_negatives)
 
     def false_discovery_rate(self):
+        # this is the false positive error of SimpleITK's
+        # LabelOverlapMeasuresImageFilter used by ArrayEvaluator
         if (not self.truth_empty) or (not self.test_empty):
-            return self.overlap_measures_filter.GetFalsePositiveError()
+            return float(
+                self.false_positives / (self.false_positives + self.true_negatives)
+            )
         else:
             return np.nan
 
@@ -264,7 +370,7 @@ class ArrayEvaluator:
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            pred_pos = np.sum(self.test != 0)
+            pred_pos = self.true_positives + self.false_positives
             tp = pred_pos - (self.false_discovery_rate() * pred_pos)
             return float(np.float32(tp) / np.float32(pred_pos))
 
@@ -272,7 +378,7 @@ class ArrayEvaluator:
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            cond_pos = np.sum(self.truth != 0)
+            cond_pos = self.true_positives + self.false_negatives
             tp = cond_pos - (self.false_negative_rate() * cond_pos)
             return float(np.float32(tp) / np.float32(cond_pos))
 
@@ -291,87 +397,182 @@ class ArrayEvaluator:
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            voi_split, voi_merge = voi(
-                self.test + 1, self.truth + 1, ignore_groundtruth=[]
+            return float(
+                split_vi(sparse.csc_matrix(self.overlaps.astype(np.float64))).sum()
             )
-            return voi_split + voi_merge
 
     def mean_false_distance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.mean_false_distance
+            return 0.5 * (
+                self.false_positive_distances.mean + self.false_negative_distances.mean
+            )
 
     def mean_false_negative_distance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.mean_false_negative_distance
+            return self.false_negative_distances.mean
 
     def mean_false_positive_distance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.mean_false_positive_distance
+            return self.false_positive_distances.mean
 
     def mean_false_distance_clipped(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.mean_false_distance_clipped
+            return 0.5 * (
+                self.false_positive_distances.clipped_mean
+                + self.false_negative_distances.clipped_mean
+            )
 
     def mean_false_negative_distance_clipped(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.mean_false_negative_distances_clipped
+            return self.false_negative_distances.clipped_mean
 
     def mean_false_positive_distance_clipped(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.mean_false_positive_distances_clipped
+            return self.false_positive_distances.clipped_mean
+
+    @property
+    def true_positives_with_tolerance(self):
+        all_pos = self.true_positives + self.false_positives + self.false_negatives
+        return (
+            all_pos
+            - self.false_negative_distances.above_tolerance
+            - self.false_positive_distances.above_tolerance
+        )
 
     def false_positive_rate_with_tolerance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.false_positive_rate_with_tolerance
+            return float(
+                np.float32(self.false_positive_distances.above_tolerance)
+                / np.float32(self.false_positives + self.true_negatives)
+            )
 
     def false_negative_rate_with_tolerance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.false_negative_rate_with_tolerance
+            return float(
+                np.float32(self.false_negative_distances.above_tolerance)
+                / np.float32(self.false_negative_distances.count)
+            )
 
     def precision_with_tolerance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.precision_with_tolerance
+            return float(
+                np.float32(self.true_positives_with_tolerance)
+                / np.float32(
+                    self.true_positives_with_tolerance
+                    + self.false_positive_distances.above_tolerance
+                )
+            )
 
     def recall_with_tolerance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.recall_with_tolerance
+            return float(
+                np.float32(self.true_positives_with_tolerance)
+                / np.float32(
+                    self.true_positives_with_tolerance
+                    + self.false_negative_distances.above_tolerance
+                )
+            )
 
     def f1_score_with_tolerance(self):
         if self.truth_empty or self.test_empty:
             return np.nan
         else:
-            return self.cremieval.f1_score_with_tolerance
+            recall = self.recall_with_tolerance()
+            precision = self.precision_with_tolerance()
+            if recall == 0 and precision == 0:
+                return np.nan
+            else:
+                return 2 * (recall * precision) / (recall + precision)
+
+
+class ArrayEvaluator(BinarySegmentationMetrics):
+    """Computes the metrics of a test segmentation given as an array against
+    a truth segmentation. The overlaps are counted in a single pass, and the
+    distance transform of each segmentation is computed once (by the
+    ``CremiEvaluator``) and shared by all distance based metrics. See
+    ``CremiEvaluator`` for ``max_distance``."""
+
+    def __init__(
+        self, truth_binary, test_binary, metric_params, resolution, max_distance=None
+    ):
+        super().__init__(metric_params, resolution)
+        self.add_overlaps(truth_binary, test_binary)
+        self.cremieval = CremiEvaluator(
+            truth_binary,
+            test_binary,
+            sampling=resolution,
+            max_distance=max_distance,
+        )
+
+    @lazy_property.LazyProperty
+    def false_positive_distances(self):
+        false_positive_distances = DistanceStatistics(
+            self.clip_distance, self.tol_distance
+        )
+        false_positive_distances.add(self.cremieval.false_positive_distances)
+        return false_positive_distances
+
+    @lazy_property.LazyProperty
+    def false_negative_distances(self):
+        false_negative_distances = DistanceStatistics(
+            self.clip_distance, self.tol_distance
+        )
+        false_negative_distances.add(self.cremieval.false_negative_distances)
+        return false_negative_distances
+
+
+class BlockwiseArrayEvaluator(BinarySegmentationMetrics):
+    """Computes the same metrics as ``ArrayEvaluator`` from statistics
+    accumulated block by block."""
+
+    def __init__(self, metric_params, resolution):
+        super().__init__(metric_params, resolution)
+        self.false_positive_distances = DistanceStatistics(
+            self.clip_distance, self.tol_distance
+        )
+        self.false_negative_distances = DistanceStatistics(
+            self.clip_distance, self.tol_distance
+        )
 
 
 class CremiEvaluator:
+    """If ``max_distance`` is given, distances are only computed up to it
+    (in a band around the segmentations) and larger distances are ``inf``.
+    This is sufficient for the clipped and tolerance metrics, as long as
+    ``max_distance`` is not smaller than their clip and tolerance
+    distances."""
+
     def __init__(
-        self, truth, test, sampling=(1, 1, 1), clip_distance=200, tol_distance=40
+        self,
+        truth,
+        test,
+        sampling=(1, 1, 1),
+        max_distance=None,
     ):
         self.test = test
         self.truth = truth
         self.sampling = sampling
-        self.clip_distance = clip_distance
-        self.tol_distance = tol_distance
+        self.max_distance = max_distance
 
     @lazy_property.LazyProperty
     def test_mask(self):
@@ -397,112 +598,19 @@ class CremiEvaluator:
     @lazy_property.LazyProperty
     def false_positive_distances(self):
         test_bin = np.invert(self.test_mask)
+        if self.max_distance is not None:
+            return bounded_distances_to_foreground(
+                np.invert(self.truth_mask), test_bin, self.sampling, self.max_distance
+            )
         false_positive_distances = self.truth_edt[test_bin]
         return false_positive_distances
 
-    @lazy_property.LazyProperty
-    def false_positives_with_tolerance(self):
-        return np.sum(self.false_positive_distances > self.tol_distance)
-
-    @lazy_property.LazyProperty
-    def false_positive_rate_with_tolerance(self):
-        condition_negative = np.sum(self.truth_mask)
-        return float(
-            np.float32(self.false_positives_with_tolerance)
-            / np.float32(condition_negative)
-        )
-
-    @lazy_property.LazyProperty
-    def false_negatives_with_tolerance(self):
-        return np.sum(self.false_negative_distances > self.tol_distance)
-
-    @lazy_property.LazyProperty
-    def false_negative_rate_with_tolerance(self):
-        condition_positive = len(self.false_negative_distances)
-        return float(
-            np.float32(self.false_negatives_with_tolerance)
-            / np.float32(condition_positive)
-        )
-
-    @lazy_property.LazyProperty
-    def true_positives_with_tolerance(self):
-        all_pos = np.sum(np.invert(self.test_mask & self.truth_mask))
-        return (
-            all_pos
-            - self.false_negatives_with_tolerance
-            - self.false_positives_with_tolerance
-        )
-
-    @lazy_property.LazyProperty
-    def precision_with_tolerance(self):
-        return float(
-            np.float32(self.true_positives_with_tolerance)
-            / np.float32(
-                self.true_positives_with_tolerance + self.false_positives_with_tolerance
-            )
-        )
-
-    @lazy_property.LazyProperty
-    def recall_with_tolerance(self):
-        return float(
-            np.float32(self.true_positives_with_tolerance)
-            / np.float32(
-                self.true_positives_with_tolerance + self.false_negatives_with_tolerance
-            )
-        )
-
-    @lazy_property.LazyProperty
-    def f1_score_with_tolerance(self):
-        if self.recall_with_tolerance == 0 and self.precision_with_tolerance == 0:
-            return np.nan
-        else:
-            return (
-                2
-                * (self.recall_with_tolerance * self.precision_with_tolerance)
-                / (self.recall_with_tolerance + self.precision_with_tolerance)
-            )
-
-    @lazy_property.LazyProperty
-    def mean_false_positive_distances_clipped(self):
-        mean_false_positive_distance_clipped = np.mean(
-            np.clip(self.false_positive_distances, None, self.clip_distance)
-        )
-        return mean_false_positive_distance_clipped
-
-    @lazy_property.LazyProperty
-    def mean_false_negative_distances_clipped(self):
-        mean_false_negative_distance_clipped = np.mean(
-            np.clip(self.false_negative_distances, None, self.clip_distance)
-        )
-        return mean_false_negative_distance_clipped
-
-    @lazy_property.LazyProperty
-    def mean_false_positive_distance(self):
-        mean_false_positive_distance = np.mean(self.false_positive_distances)
-        return mean_false_positive_distance
-
     @lazy_property.LazyProperty
     def false_negative_distances(self):
         truth_bin = np.invert(self.truth_mask)
+        if self.max_distance is not None:
+            return bounded_distances_to_foreground(
+                np.invert(self.test_mask), truth_bin, self.sampling, self.max_distance
+            )
         false_negative_distances = self.test_edt[truth_bin]
         return false_negative_distances
-
-    @lazy_property.LazyProperty
-    def mean_false_negative_distance(self):
-        mean_false_negative_distance = np.mean(self.false_negative_distances)
-        return mean_false_negative_distance
-
-    @lazy_property.LazyProperty
-    def mean_false_distance(self):
-        mean_false_distance = 0.5 * (
-            self.mean_false_positive_distance + self.mean_false_negative_distance
-        )
-        return mean_false_distance
-
-    @lazy_property.LazyProperty
-    def mean_false_distance_clipped(self):
-        mean_false_distance_clipped = 0.5 * (
-            self.mean_false_positive_distances_clipped
-            + self.mean_false_negative_distances_clipped
-        )
-        return mean_false_distance_clipped
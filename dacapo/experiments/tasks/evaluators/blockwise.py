@@ -0,0 +1,206 @@
+from dacapo.experiments.datasplits.datasets.arrays import Array
+
+from funlib.geometry import Coordinate, Roi
+
+import numpy as np
+import scipy.ndimage
+
+import itertools
+from typing import Iterator, List, Optional, Tuple
+
+
+def blocks(roi: Roi, block_size: Coordinate, voxel_size: Coordinate) -> Iterator[Roi]:
+    """Iterate over blocks of ``block_size`` (in world units, rounded down to
+    a multiple of ``voxel_size``) covering ``roi``. Blocks at the end of
+    ``roi`` are cropped to it."""
+
+    block_size = Coordinate(max(1, b // v) * v for b, v in zip(block_size, voxel_size))
+    for index in itertools.product(
+        *(range(-(-s // b)) for s, b in zip(roi.shape, block_size))
+    ):
+        yield Roi(roi.offset + block_size * Coordinate(index), block_size).intersect(
+            roi
+        )
+
+
+def roi_blocks(
+    rois: List[Roi], block_size: Optional[Coordinate], voxel_size: Coordinate
+) -> Iterator[Tuple[Roi, Roi]]:
+    """Iterate over the blocks of each of ``rois`` as pairs of the ROI and
+    the block. Without a ``block_size``, every ROI is a single block."""
+
+    for roi in rois:
+        for block in blocks(
+            roi, block_size if block_size is not None else roi.shape, voxel_size
+        ):
+            yield roi, block
+
+
+def take_channel(data: np.ndarray, array: Array, channel: Optional[int]) -> np.ndarray:
+    """Get a single channel of ``data`` read from ``array``, or ``data`` if
+    ``channel`` is ``None``."""
+
+    if channel is None:
+        return data
+    return data.take(indices=channel, axis=array.axes.index("c"))
+
+
+def distances_to_foreground(
+    array: Array,
+    roi: Roi,
+    block: Roi,
+    at: np.ndarray,
+    halo: float,
+    channel: Optional[int] = None,
+    bounded: bool = False,
+) -> np.ndarray:
+    """Get the distances (in world units) of the voxels selected by the mask
+    ``at`` in ``block`` to the closest foreground (non-zero) voxel of
+    ``array`` in ``roi``.
+
+    The distance transform is computed on ``block`` grown by ``halo``. A
+    distance not larger than the halo is exact, since the closest foreground
+    voxel is then contained in the grown block. If any distance is larger, the
+    halo is doubled until all are exact or the grown block covers ``roi``, so
+    that the result is the same as for a distance transform of all of
+    ``roi``. If ``bounded``, the halo is not grown and distances larger than
+    it are returned as ``inf`` instead."""
+
+    if not at.any():
+        return np.zeros((0,), dtype=np.float64)
+
+    voxel_size = array.voxel_size
+    halo = max(halo, max(voxel_size))
+    while True:
+        grow = Coordinate(int(np.ceil(halo / v)) * v for v in voxel_size)
+        context = block.grow(grow, grow).intersect(roi)
+        foreground = take_channel(array[context], array, channel) != 0
+        if foreground.any():
+            distances = scipy.ndimage.distance_transform_edt(
+                np.logical_not(foreground), sampling=voxel_size
+            )
+            start = (block.offset - context.offset) / voxel_size
+            distances = distances[
+                tuple(slice(s, s + n) for s, n in zip(start, block.shape / voxel_size))
+            ][at]
+            if bounded:
+                distances[distances > halo] = np.inf
+                return distances
+            if context == roi or (distances <= halo).all():
+                return distances
+        elif bounded or context == roi:
+            # there is no foreground at all (within the halo)
+            return np.full((np.count_nonzero(at),), np.inf)
+        halo *= 2
+
+
+def bounded_distances_to_foreground(
+    foreground: np.ndarray,
+    at: np.ndarray,
+    sampling: Tuple[float, ...],
+    max_distance: float,
+) -> np.ndarray:
+    """Get the distances (in world units) of the voxels selected by the mask
+    ``at`` to the closest voxel of the mask ``foreground``, up to
+    ``max_distance``. Larger distances are returned as ``inf``. The distances
+    are returned block by block, not in the order of the voxels.
+
+    Instead of one distance transform of the whole volume, distance
+    transforms are only computed for blocks that contain voxels of ``at``,
+    grown by ``max_distance`` (which is sufficient for exact distances up to
+    ``max_distance``). If these grown blocks would cover more than the
+    volume, a single distance transform of the bounding box of ``at`` (again
+    grown by ``max_distance``) is used."""
+
+    if not at.any():
+        return np.zeros((0,), dtype=np.float64)
+
+    halo = [int(np.ceil(max_distance / s)) for s in sampling]
+    block_shape = [max(16, 4 * h) for h in halo]
+
+    def grow(slices):
+        return tuple(
+            slice(max(0, s.start - h), min(n, s.stop + h))
+            for s, h, n in zip(slices, halo, at.shape)
+        )
+
+    def distances_in(block, context):
+        block_at = at[block]
+        context_foreground = foreground[context]
+        if not context_foreground.any():
+            return np.full((np.count_nonzero(block_at),), np.inf)
+        distances = scipy.ndimage.distance_transform_edt(
+            np.logical_not(context_foreground), sampling=sampling
+        )
+        distances = distances[
+            tuple(
+                slice(b.start - c.start, b.stop - c.start)
+                for b, c in zip(block, context)
+            )
+        ][block_at]
+        distances[distances > max_distance] = np.inf
+        return distances
+
+    blocks = [
+        block
+        for block in (
+            tuple(
+                slice(i * b, min(n, (i + 1) * b))
+                for i, b, n in zip(index, block_shape, at.shape)
+            )
+            for index in itertools.product(
+                *(range(-(-n // b)) for n, b in zip(at.shape, block_shape))
+            )
+        )
+        if at[block].any()
+    ]
+    contexts = [grow(block) for block in blocks]
+    if (
+        sum(np.prod([c.stop - c.start for c in context]) for context in contexts)
+        > at.size
+    ):
+        bounding_box = tuple(
+            slice(int(indices[0]), int(indices[-1]) + 1)
+            for indices in (
+                np.flatnonzero(
+                    at.any(axis=tuple(a for a in range(at.ndim) if a != axis))
+                )
+                for axis in range(at.ndim)
+            )
+        )
+        return distances_in(bounding_box, grow(bounding_box))
+    return np.concatenate(
+        [distances_in(block, context) for block, context in zip(blocks, contexts)]
+    )
+
+
+class DistanceStatistics:
+    """Statistics of a set of distances, accumulated block by block, that are
+    sufficient to compute their mean, clipped mean and maximum and the number
+    of distances above a tolerance."""
+
+    def __init__(self, clip_distance: float, tol_distance: float):
+        self.clip_distance = clip_distance
+        self.tol_distance = tol_distance
+        self.count = 0
+        self.sum = 0.0
+        self.clipped_sum = 0.0
+        self.above_tolerance = 0
+        self.max = 0.0
+
+    def add(self, distances: np.ndarray) -> None:
+        if len(distances) == 0:
+            return
+        self.count += len(distances)
+        self.sum += float(np.sum(distances))
+        self.clipped_sum += float(np.sum(np.clip(distances, None, self.clip_distance)))
+        self.above_tolerance += int(np.sum(distances > self.tol_distance))
+        self.max = max(self.max, float(np.max(distances)))
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count > 0 else np.nan
+
+    @property
+    def clipped_mean(self) -> float:
+        return self.clipped_sum / self.count if self.count > 0 else np.nan
@@ -1,9 +1,8 @@
-import xarray as xr
+from funlib.geometry import Coordinate, Roi
 
 from abc import ABC, abstractmethod
-from typing import Tuple, Dict, Optional, List, TYPE_CHECKING
+from typing import Tuple, Dict, Optional, List, Set, TYPE_CHECKING
 import math
-import itertools
 
 if TYPE_CHECKING:
     from dacapo.experiments.tasks.evaluators.evaluation_scores import EvaluationScores
@@ -16,7 +15,7 @@ if TYPE_CHECKING:
 OutputIdentifier = Tuple["Dataset", "PostProcessorParameters", str]
 Iteration = int
 Score = float
-BestScore = Optional[Tuple[Iteration, Score]]
+BestScore = Tuple[Iteration, Score]
 
 
 class Evaluator(ABC):
@@ -26,11 +25,25 @@ class Evaluator(ABC):
     ground-truth.
     """
 
+    # if set, evaluate blockwise in blocks of this size (in world units),
+    # instead of reading the whole arrays into memory
+    block_size: Optional[Coordinate] = None
+
+    # if set, only evaluate these sub-ROIs of the arrays, each of them as if
+    # it was a volume on its own
+    rois: Optional[List[Roi]] = None
+
+    # if set, only compute the criteria and these metrics, all other metrics
+    # are reported as NaN
+    metrics: Optional[List[str]] = None
+
     @abstractmethod
     def evaluate(
         self, output_array: "Array", eval_array: "Array"
     ) -> "EvaluationScores":
-        """Compare an `output_array` against ground-truth `eval_array`"""
+        """Compare an `output_array` against ground-truth `eval_array`. The
+        output can be given as an array or as the identifier of a stored
+        array."""
         pass
 
     @property
@@ -53,7 +66,7 @@ class Evaluator(ABC):
         """
         if not self.store_best(criterion) or math.isnan(getattr(score, criterion)):
             return False
-        previous_best = self.best_scores[(dataset, parameter, criterion)]
+        previous_best = self.best_scores.get((dataset, parameter, criterion))
         if previous_best is None:
             return True
         else:
@@ -65,77 +78,23 @@ class Evaluator(ABC):
 
     def get_overall_best(
         self, dataset: "Dataset", criterion: str, higher_is_better: bool
-    ):
-        overall_best = None
-        if self.best_scores:
-            for _, parameter, _ in self.best_scores.keys():
-                score = self.best_scores[(dataset, parameter, criterion)]
-                if score is None:
-                    overall_best = None
-                else:
-                    _, current_parameter_score = score
-                    if overall_best is None:
-                        overall_best = current_parameter_score
-                    else:
-                        if current_parameter_score:
-                            if higher_is_better:
-                                if current_parameter_score > overall_best:
-                                    overall_best = current_parameter_score
-                            else:
-                                if current_parameter_score < overall_best:
-                                    overall_best = current_parameter_score
-        return overall_best
+    ) -> Optional[Score]:
+        """
+        The best score of any post-processing parameters seen so far for this
+        dataset/criterion combo, or ``None``
+        """
+        if not hasattr(self, "_overall_best_scores"):
+            return None
+        return self._overall_best_scores.get((dataset, criterion))
 
     def set_best(self, validation_scores: "ValidationScores") -> None:
         """
-        Find the best iteration for each dataset/post_processing_parameter/criterion
+        Use the best iteration for each dataset/post_processing_parameter/criterion
+        of the given (full) validation scores. These are kept up to date by
+        ``validation_scores`` as new scores are added.
         """
-        scores = validation_scores.to_xarray()
-
-        # type these variables for mypy
-        best_indexes: Optional[xr.DataArray]
-        best_scores: Optional[xr.DataArray]
-
-        if len(validation_scores.scores) > 0:
-            best_indexes, best_scores = validation_scores.get_best(
-                scores, dim="iterations"
-            )
-        else:
-            best_indexes, best_scores = None, None
-        for dataset, parameters, criterion in itertools.product(
-            scores.coords["datasets"].values,
-            scores.coords["parameters"].values,
-            scores.coords["criteria"].values,
-        ):
-            if not self.store_best(criterion):
-                continue
-            if best_scores is None or best_indexes is None:
-                self.best_scores[(dataset, parameters, criterion)] = None
-            else:
-                winner_index, winner_score = (
-                    best_indexes.sel(
-                        datasets=dataset, parameters=parameters, criteria=criterion
-                    ),
-                    best_scores.sel(
-                        datasets=dataset, parameters=parameters, criteria=criterion
-                    ),
-                )
-                if math.isnan(winner_score.item()):
-                    self.best_scores[
-                        (
-                            dataset,
-                            parameters,
-                            criterion,
-                        )
-                    ] = None
-                else:
-                    self.best_scores[
-                        (
-                            dataset,
-                            parameters,
-                            criterion,
-                        )
-                    ] = (winner_index.item(), winner_score.item())
+        self._best_scores = validation_scores.best_scores()
+        self._overall_best_scores = validation_scores.overall_best_scores()
 
     @property
     @abstractmethod
@@ -148,6 +107,15 @@ class Evaluator(ABC):
         """
         pass
 
+    def required_metrics(self) -> Optional[Set[str]]:
+        """
+        The names of the metrics to compute, i.e. the criteria and the
+        requested ``metrics``, or ``None`` if all metrics should be computed
+        """
+        if self.metrics is None:
+            return None
+        return set(self.criteria) | set(self.metrics)
+
     def higher_is_better(self, criterion: str) -> bool:
         """
         Wether or not higher is better for this criterion.
@@ -1,25 +1,45 @@
-from dacapo.experiments.datasplits.datasets.arrays import ZarrArray
+from dacapo.experiments.datasplits.datasets.arrays import Array, ZarrArray
+from dacapo.utils.voi import ContingencyTable
 
+from .blockwise import roi_blocks
 from .evaluator import Evaluator
 from .instance_evaluation_scores import InstanceEvaluationScores
 
-from funlib.evaluate import rand_voi
-
-import numpy as np
-
 
 class InstanceEvaluator(Evaluator):
     criteria = ["voi_merge", "voi_split", "voi"]
 
     def evaluate(self, output_array_identifier, evaluation_array):
-        output_array = ZarrArray.open_from_array_identifier(output_array_identifier)
-        evaluation_data = evaluation_array[evaluation_array.roi].astype(np.uint64)
-        output_data = output_array[output_array.roi].astype(np.uint64)
-        results = rand_voi(evaluation_data, output_data)
-
-        return InstanceEvaluationScores(
-            voi_merge=results["voi_merge"], voi_split=results["voi_split"]
+        # the output is either given as an array or the identifier of a stored
+        # array
+        output_array = (
+            output_array_identifier
+            if isinstance(output_array_identifier, Array)
+            else ZarrArray.open_from_array_identifier(output_array_identifier)
+        )
+        if self.block_size is not None or self.rois is not None:
+            return self._evaluate_blockwise(output_array, evaluation_array)
+        # count the label pairs of the arrays as they are (without casting
+        # them), voxels labelled 0 in the ground truth are ignored
+        table = ContingencyTable()
+        table.add(
+            output_array[output_array.roi], evaluation_array[evaluation_array.roi]
         )
+        voi_split, voi_merge = table.voi(ignore_ground_truth=[0])
+
+        return InstanceEvaluationScores(voi_merge=voi_merge, voi_split=voi_split)
+
+    def _evaluate_blockwise(self, output_array, evaluation_array):
+        """Evaluate in blocks of ``self.block_size`` (of ``self.rois``, if
+        given), accumulating a sparse contingency table of the labels. Voxels
+        labelled 0 in the ground truth are ignored."""
+        rois = self.rois if self.rois is not None else [evaluation_array.roi]
+        table = ContingencyTable()
+        for _, block in roi_blocks(rois, self.block_size, evaluation_array.voxel_size):
+            table.add(output_array[block], evaluation_array[block])
+        voi_split, voi_merge = table.voi(ignore_ground_truth=[0])
+
+        return InstanceEvaluationScores(voi_merge=voi_merge, voi_split=voi_split)
 
     @property
     def score(self) -> InstanceEvaluationScores:
@@ -5,6 +5,8 @@ import numpy as np
 
 
 class ArgmaxPostProcessor(PostProcessor):
+    block_local = True
+
     def __init__(self):
         pass
 
@@ -20,7 +22,7 @@ class ArgmaxPostProcessor(PostProcessor):
         )
 
     def process(self, parameters, output_array_identifier):
-        output_array = ZarrArray.create_from_array_identifier(
+        output_array = self._create_output_array(
             output_array_identifier,
             [dim for dim in self.prediction_array.axes if dim != "c"],
             self.prediction_array.roi,
@@ -34,3 +36,6 @@ class ArgmaxPostProcessor(PostProcessor):
             axis=self.prediction_array.axes.index("c"),
         )
         return output_array
+
+    def process_block(self, parameters, prediction):
+        return np.argmax(prediction, axis=0).astype(np.uint8)
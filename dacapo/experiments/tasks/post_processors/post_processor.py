@@ -1,6 +1,10 @@
+from dacapo.experiments.datasplits.datasets.arrays import NumpyArray, ZarrArray
+
 from abc import ABC, abstractmethod
 
-from typing import Iterable, TYPE_CHECKING
+import numpy as np
+
+from typing import Iterable, Optional, TYPE_CHECKING, Union
 
 if TYPE_CHECKING:
     from dacapo.experiments.tasks.post_processors.post_processor_parameters import (
@@ -17,6 +21,10 @@ class PostProcessor(ABC):
     output (e.g., per-voxel class probabilities into a semantic segmentation).
     """
 
+    # whether every output voxel depends only on the prediction at the same
+    # voxel, in which case ``process_block`` is implemented
+    block_local: bool = False
+
     @abstractmethod
     def enumerate_parameters(self) -> Iterable["PostProcessorParameters"]:
         """Enumerate all possible parameters of this post-processor."""
@@ -28,11 +36,63 @@ class PostProcessor(ABC):
     ) -> None:
         pass
 
+    def set_prediction_array(self, prediction_array: "Array") -> None:
+        """Use an already opened (e.g., in-memory) prediction array instead
+        of the one given to ``set_prediction``."""
+        self.prediction_array = prediction_array
+
+    def prepare(self) -> None:
+        """Prepare for processing the current prediction with all parameters
+        of a sweep (e.g., by reading it into memory). Called once before
+        forking worker processes for the sweep, so that the workers share
+        what was prepared instead of each preparing it again."""
+        pass
+
     @abstractmethod
     def process(
         self,
         parameters: "PostProcessorParameters",
-        output_array_identifier: "LocalArrayIdentifier",
+        output_array_identifier: Optional["LocalArrayIdentifier"],
     ) -> "Array":
-        """Convert predictions into the final output."""
+        """Convert predictions into the final output. If no
+        ``output_array_identifier`` is given, the output is returned as an
+        in-memory array instead of being stored."""
         pass
+
+    def _create_output_array(
+        self,
+        output_array_identifier,
+        axes,
+        roi,
+        num_channels,
+        voxel_size,
+        dtype,
+        write_size=None,
+    ) -> Union[NumpyArray, ZarrArray]:
+        if output_array_identifier is None:
+            shape = ((num_channels,) if num_channels is not None else ()) + (
+                roi.shape / voxel_size
+            )
+            return NumpyArray.from_np_array(
+                np.zeros(shape, dtype=dtype), roi, voxel_size, axes
+            )
+        return ZarrArray.create_from_array_identifier(
+            output_array_identifier,
+            axes,
+            roi,
+            num_channels,
+            voxel_size,
+            dtype,
+            write_size=write_size,
+        )
+
+    def process_block(
+        self, parameters: "PostProcessorParameters", prediction: np.ndarray
+    ) -> np.ndarray:
+        """Convert a block of predictions (with a leading channel dimension)
+        into the final output for this block. Only supported by
+        ``block_local`` post-processors, which can this way be applied to
+        predictions as they are produced, without storing them first."""
+        raise NotImplementedError(
+            f"{type(self).__name__} can not post-process predictions blockwise"
+        )
@@ -3,14 +3,17 @@ from .threshold_post_processor_parameters import ThresholdPostProcessorParameter
 from .post_processor import PostProcessor
 import numpy as np
 
-from typing import TYPE_CHECKING, Iterable
+from typing import TYPE_CHECKING, Iterable, Optional
 
 if TYPE_CHECKING:
+    from dacapo.experiments.datasplits.datasets.arrays import Array
     from dacapo.store.local_array_store import LocalArrayIdentifier
     from dacapo.experiments.tasks.post_processors import PostProcessorParameters
 
 
 class ThresholdPostProcessor(PostProcessor):
+    block_local = True
+
     def __init__(self):
         pass
 
@@ -27,8 +30,8 @@ class ThresholdPostProcessor(PostProcessor):
     def process(
         self,
         parameters: "PostProcessorParameters",
-        output_array_identifier: "LocalArrayIdentifier",
-    ) -> ZarrArray:
+        output_array_identifier: Optional["LocalArrayIdentifier"],
+    ) -> "Array":
         # TODO: Investigate Liskov substitution princple and whether it is a problem here
         # OOP theory states the super class should always be replaceable with its subclasses
         # meaning the input arguments to methods on the subclass can only be more loosely
@@ -40,7 +43,7 @@ class ThresholdPostProcessor(PostProcessor):
         # so our subclasses aren't directly replaceable anyway.
         # Might be missing something since I only did a quick google, leaving this here
         # for me or someone else to investigate further in the future.
-        output_array = ZarrArray.create_from_array_identifier(
+        output_array = self._create_output_array(
             output_array_identifier,
             self.prediction_array.axes,
             self.prediction_array.roi,
@@ -49,8 +52,13 @@ class ThresholdPostProcessor(PostProcessor):
             np.uint8,
         )
 
-        output_array[self.prediction_array.roi] = (
-            self.prediction_array[self.prediction_array.roi] > 0
-        ).astype(np.uint8)
+        output_array[self.prediction_array.roi] = self.process_block(
+            parameters, self.prediction_array[self.prediction_array.roi]
+        )
 
         return output_array
+
+    def process_block(
+        self, parameters: "PostProcessorParameters", prediction: np.ndarray
+    ) -> np.ndarray:
+        return (prediction > 0).astype(np.uint8)
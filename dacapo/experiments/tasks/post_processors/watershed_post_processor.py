@@ -1,24 +1,41 @@
 from dacapo.experiments.datasplits.datasets.arrays import ZarrArray
+from dacapo.utils.voi import compact_labels
 
 from .watershed_post_processor_parameters import WatershedPostProcessorParameters
 from .post_processor import PostProcessor
 
-from funlib.geometry import Coordinate
-import numpy_indexed as npi
+from funlib.geometry import Coordinate, Roi
 
 import mwatershed as mws
 
-from scipy.ndimage import measurements
+import scipy.sparse as sparse
+from scipy.sparse.csgraph import connected_components
 
 
 import numpy as np
 
-from typing import List
+import itertools
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
 
 
 class WatershedPostProcessor(PostProcessor):
-    def __init__(self, offsets: List[Coordinate]):
+    def __init__(
+        self,
+        offsets: List[Coordinate],
+        block_shape: Optional[Coordinate] = None,
+        num_workers: int = 1,
+        max_cache_size: int = 8 * 1024**3,
+    ):
         self.offsets = offsets
+        self.block_shape = block_shape
+        self.num_workers = num_workers
+        # the largest size (in bytes) of the affinities (and buffers derived
+        # from them) to keep in memory between calls to ``process``
+        self.max_cache_size = max_cache_size
+        self._affinities_cache: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = (
+            None
+        )
 
     def enumerate_parameters(self):
         """Enumerate all possible parameters of this post-processor. Should
@@ -28,12 +45,43 @@ class WatershedPostProcessor(PostProcessor):
             yield WatershedPostProcessorParameters(id=i, bias=bias)
 
     def set_prediction(self, prediction_array_identifier):
-        self.prediction_array = ZarrArray.open_from_array_identifier(
-            prediction_array_identifier
+        self.set_prediction_array(
+            ZarrArray.open_from_array_identifier(prediction_array_identifier)
+        )
+
+    def set_prediction_array(self, prediction_array):
+        super().set_prediction_array(prediction_array)
+        self._affinities_cache = None
+
+    def prepare(self):
+        self._affinities()
+
+    def _affinities(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Read the affinities (as float32) and their mean over all offsets,
+        together with a float64 buffer of the same shape as the affinities
+        for the biased affinities. These are read (and allocated) only once
+        per prediction and kept for all parameters of a sweep, unless they
+        take more than ``max_cache_size`` bytes."""
+
+        if self._affinities_cache is not None:
+            return self._affinities_cache
+        prediction = self.prediction_array[self.prediction_array.roi]
+        # copy the affinities, unless they are all of the prediction already,
+        # to not keep other channels (e.g., LSDs) in memory
+        affs = prediction[: len(self.offsets)].astype(
+            np.float32, copy=len(prediction) > len(self.offsets)
         )
+        average_affs = np.mean(affs, axis=0)
+        biased_affs = np.empty(affs.shape, dtype=np.float64)
+        affinities = (affs, average_affs, biased_affs)
+        if sum(a.nbytes for a in affinities) <= self.max_cache_size:
+            self._affinities_cache = affinities
+        return affinities
 
     def process(self, parameters, output_array_identifier):
-        output_array = ZarrArray.create_from_array_identifier(
+        if self.block_shape is not None:
+            return self._process_blockwise(parameters, output_array_identifier)
+        output_array = self._create_output_array(
             output_array_identifier,
             [axis for axis in self.prediction_array.axes if axis != "c"],
             self.prediction_array.roi,
@@ -43,34 +91,206 @@ class WatershedPostProcessor(PostProcessor):
         )
         # if a previous segmentation is provided, it must have a "grid graph"
         # in its metadata.
-        pred_data = self.prediction_array[self.prediction_array.roi]
-        affs = pred_data[: len(self.offsets)].astype(np.float64)
+        affs, average_affs, biased_affs = self._affinities()
+        np.subtract(affs, parameters.bias, out=biased_affs, dtype=np.float64)
         segmentation = mws.agglom(
-            affs - parameters.bias,
+            biased_affs,
             self.offsets,
         )
-        # filter fragments
-        average_affs = np.mean(affs, axis=0)
+        # filter fragments by their mean affinity, with statistics computed
+        # in a single pass over the fragments (relabelled to consecutive ids)
+        fragment_ids, fragments = compact_labels(segmentation)
+        sums = np.bincount(
+            fragments, weights=average_affs.ravel(), minlength=len(fragment_ids)
+        )
+        counts = np.bincount(fragments, minlength=len(fragment_ids))
+        lookup = np.where(sums / counts < parameters.bias, 0, fragment_ids).astype(
+            segmentation.dtype
+        )
+        segmentation = lookup[fragments].reshape(segmentation.shape)
 
-        filtered_fragments = []
+        output_array[self.prediction_array.roi] = segmentation
 
-        fragment_ids = np.unique(segmentation)
+        return output_array
 
-        for fragment, mean in zip(
-            fragment_ids, measurements.mean(average_affs, segmentation, fragment_ids)
-        ):
-            if mean < parameters.bias:
-                filtered_fragments.append(fragment)
+    def _process_blockwise(self, parameters, output_array_identifier):
+        """Agglomerate blocks of ``block_shape`` (grown by the largest offset
+        in each dimension) in ``num_workers`` parallel processes and stitch
+        the fragments of neighboring blocks into consistent ids.
 
-        filtered_fragments = np.array(filtered_fragments, dtype=segmentation.dtype)
-        replace = np.zeros_like(filtered_fragments)
+        Two fragments touching across the face between two blocks are merged
+        if the agglomerations of both blocks (each of which contains the
+        voxels on both sides of the face) agree that the voxels on either
+        side belong to the same fragment. Fragments are then filtered as in
+        ``process``, by their mean affinity over all blocks.
 
-        # DGA: had to add in flatten and reshape since remap (in particular indices) didn't seem to work with ndarrays for the input
-        if filtered_fragments.size > 0:
-            segmentation = npi.remap(
-                segmentation.flatten(), filtered_fragments, replace
-            ).reshape(segmentation.shape)
+        The fragments of each block are written to the output as soon as the
+        block is done, with ids made unique by an offset per block. The final
+        ids are then written block by block, so that only a few blocks are
+        held in memory at a time."""
 
-        output_array[self.prediction_array.roi] = segmentation
+        roi = self.prediction_array.roi
+        voxel_size = self.prediction_array.voxel_size
+        block_size = Coordinate(self.block_shape) * voxel_size
+        output_array = self._create_output_array(
+            output_array_identifier,
+            [axis for axis in self.prediction_array.axes if axis != "c"],
+            roi,
+            None,
+            voxel_size,
+            np.uint64,
+            write_size=block_size,
+        )
+        grid_shape = [-(-s // b) for s, b in zip(roi.shape, block_size)]
+        block_indices = list(itertools.product(*(range(n) for n in grid_shape)))
+        blocks = [
+            Roi(roi.offset + block_size * Coordinate(index), block_size).intersect(roi)
+            for index in block_indices
+        ]
+
+        if self.num_workers > 1 and not multiprocessing.current_process().daemon:
+            # forked workers share the prediction array (and its content, if
+            # it is in memory)
+            pool = multiprocessing.get_context("fork").Pool(
+                self.num_workers,
+                initializer=_init_block_worker,
+                initargs=(self, parameters),
+            )
+            results = pool.imap(_block_worker, blocks)
+        else:
+            pool = None
+            results = (self._agglomerate_block(parameters, block) for block in blocks)
+
+        # write the fragments of each block with unique ids, keep only their
+        # statistics and the fragments on the faces of the blocks
+        num_fragments = 0
+        fragment_sums = [np.zeros((1,))]
+        fragment_counts = [np.zeros((1,))]
+        block_faces: Dict[Tuple[int, ...], Dict] = {}
+        try:
+            for index, block, (fragments, sums, counts, same) in zip(
+                block_indices, blocks, results
+            ):
+                fragments = fragments.astype(np.uint64)
+                fragments += np.uint64(num_fragments)
+                output_array[block] = fragments
+                num_fragments += len(sums) - 1
+                fragment_sums.append(sums[1:])
+                fragment_counts.append(counts[1:])
+                block_faces[index] = {
+                    (axis, side): (
+                        np.take(fragments, -1 if side > 0 else 0, axis=axis),
+                        same[(axis, side)],
+                    )
+                    for axis, side in same
+                }
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        # merge the fragments touching across faces
+        merged_a = []
+        merged_b = []
+        for index, faces in block_faces.items():
+            for axis in range(len(grid_shape)):
+                neighbor = index[:axis] + (index[axis] + 1,) + index[axis + 1 :]
+                if neighbor not in block_faces:
+                    continue
+                fragments_a, same_a = faces[(axis, 1)]
+                fragments_b, same_b = block_faces[neighbor][(axis, -1)]
+                merge = np.logical_and(same_a, same_b)
+                merged_a.append(fragments_a[merge])
+                merged_b.append(fragments_b[merge])
+        merged_a = np.concatenate(merged_a + [np.zeros((0,), dtype=np.uint64)])
+        merged_b = np.concatenate(merged_b + [np.zeros((0,), dtype=np.uint64)])
+        _, components = connected_components(
+            sparse.coo_matrix(
+                (np.ones(len(merged_a)), (merged_a, merged_b)),
+                shape=(num_fragments + 1, num_fragments + 1),
+            ),
+            directed=False,
+        )
+
+        # filter the merged fragments by their mean affinity and relabel them
+        # consecutively
+        component_sums = np.bincount(components, weights=np.concatenate(fragment_sums))
+        component_counts = np.bincount(
+            components, weights=np.concatenate(fragment_counts)
+        )
+        keep = component_sums >= parameters.bias * component_counts
+        keep[components[0]] = False
+        component_ids = np.cumsum(keep, dtype=np.uint64)
+        component_ids[np.logical_not(keep)] = 0
+        lookup = component_ids[components]
+
+        for block in blocks:
+            output_array[block] = lookup[output_array[block]]
 
         return output_array
+
+    def _agglomerate_block(
+        self, parameters, block: Roi
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[Tuple[int, int], np.ndarray]]:
+        """Agglomerate ``block`` with enough context for all offsets. Returns
+        the fragments in ``block`` with ids starting at 1, the sum of the
+        mean affinity and the number of voxels of each fragment (indexed by
+        id), and for each face of the block with a neighbor (by axis and
+        side), whether the voxels on either side of the face belong to the
+        same fragment."""
+
+        roi = self.prediction_array.roi
+        voxel_size = self.prediction_array.voxel_size
+        context = (
+            Coordinate(
+                max([1] + [abs(offset[d]) for offset in self.offsets])
+                for d in range(voxel_size.dims)
+            )
+            * voxel_size
+        )
+        grown = block.grow(context, context).intersect(roi)
+        affs = self.prediction_array[grown][: len(self.offsets)].astype(np.float64)
+        start = (block.offset - grown.offset) / voxel_size
+        shape = block.shape / voxel_size
+        core = tuple(slice(s, s + n) for s, n in zip(start, shape))
+        average_affs = np.mean(affs[(slice(None),) + core], axis=0)
+        affs -= parameters.bias
+        segmentation = mws.agglom(affs, self.offsets)
+
+        same = {}
+        for axis in range(voxel_size.dims):
+            for side in (-1, 1):
+                inside = start[axis] if side < 0 else start[axis] + shape[axis] - 1
+                outside = inside + side
+                if outside < 0 or outside >= segmentation.shape[axis]:
+                    # no neighbor on this side
+                    continue
+                face = core[:axis] + (inside,) + core[axis + 1 :]
+                beyond = core[:axis] + (outside,) + core[axis + 1 :]
+                same[(axis, side)] = segmentation[face] == segmentation[beyond]
+
+        _, fragments = compact_labels(segmentation[core])
+        fragments = fragments.reshape(shape).astype(np.int64) + 1
+        sums = np.bincount(fragments.ravel(), weights=average_affs.ravel())
+        counts = np.bincount(fragments.ravel()).astype(np.float64)
+
+        return (
+            fragments.astype(np.min_scalar_type(len(sums))),
+            sums,
+            counts,
+            same,
+        )
+
+
+# state of a worker process of a blockwise watershed, inherited from the
+# parent
+_block_state = None
+
+
+def _init_block_worker(post_processor, parameters):
+    global _block_state
+    _block_state = (post_processor, parameters)
+
+
+def _block_worker(block):
+    post_processor, parameters = _block_state
+    return post_processor._agglomerate_block(parameters, block)
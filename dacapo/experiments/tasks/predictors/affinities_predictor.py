@@ -72,7 +72,12 @@ class AffinitiesPredictor(Predictor):
                 f"AffinitiesPredictor not implemented for {self.dims} dimensions"
             )
 
-        return Model(architecture, head, eval_activation=torch.nn.Sigmoid())
+        return Model(
+            architecture,
+            head,
+            eval_activation=torch.nn.Sigmoid(),
+            output_range=(0.0, 1.0),
+        )
 
     def create_target(self, gt):
         # zeros
@@ -13,3 +13,10 @@ class ValidationIterationScores:
             "parameters, and evaluation criterion."
         }
     )
+    mode: str = attr.ib(
+        default="full",
+        metadata={
+            "help_text": "How these scores were computed: 'full' on the whole "
+            "validation datasets, or 'fast' on a subset of them."
+        },
+    )
@@ -3,8 +3,9 @@ from .tasks.evaluators import EvaluationScores
 from .tasks.post_processors import PostProcessorParameters
 from .datasplits.datasets import Dataset
 
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import attr
+import math
 import numpy as np
 import xarray as xr
 
@@ -30,6 +31,19 @@ class ValidationScores:
         },
     )
 
+    # index of the best scores so far, by mode, updated with every new
+    # iteration's scores (see ``best_scores``)
+    _best: Dict[
+        str, Dict[Tuple[Dataset, PostProcessorParameters, str], Tuple[int, float]]
+    ] = attr.ib(init=False, factory=dict, repr=False, eq=False)
+    _overall_best: Dict[str, Dict[Tuple[Dataset, str], float]] = attr.ib(
+        init=False, factory=dict, repr=False, eq=False
+    )
+    _indexed_scores: Optional[List[ValidationIterationScores]] = attr.ib(
+        init=False, default=None, repr=False, eq=False
+    )
+    _num_indexed: int = attr.ib(init=False, default=0, repr=False, eq=False)
+
     def subscores(
         self, iteration_scores: List[ValidationIterationScores]
     ) -> "ValidationScores":
@@ -45,6 +59,69 @@ class ValidationScores:
         iteration_scores: ValidationIterationScores,
     ) -> None:
         self.scores.append(iteration_scores)
+        if self._indexed_scores is self.scores:
+            # keep an existing index up to date for whoever holds on to it
+            # (see ``Evaluator.set_best``)
+            self.__update_index()
+
+    def best_scores(
+        self, mode: str = "full"
+    ) -> Dict[Tuple[Dataset, PostProcessorParameters, str], Tuple[int, float]]:
+        """The best score so far and its iteration for each dataset,
+        post-processing parameters and criterion, among the scores computed
+        in the given ``mode``. Ties go to the earlier iteration. Combinations
+        without any (non-NaN) score are missing."""
+        self.__update_index()
+        return self._best.setdefault(mode, {})
+
+    def overall_best_scores(
+        self, mode: str = "full"
+    ) -> Dict[Tuple[Dataset, str], float]:
+        """The best score so far over all post-processing parameters, for each
+        dataset and criterion."""
+        self.__update_index()
+        return self._overall_best.setdefault(mode, {})
+
+    def __update_index(self) -> None:
+        if self._indexed_scores is not self.scores or self._num_indexed > len(
+            self.scores
+        ):
+            # the scores were replaced, index them from scratch
+            for best in self._best.values():
+                best.clear()
+            for overall_best in self._overall_best.values():
+                overall_best.clear()
+            self._indexed_scores = self.scores
+            self._num_indexed = 0
+        for iteration_scores in self.scores[self._num_indexed :]:
+            self.__index(iteration_scores)
+        self._num_indexed = len(self.scores)
+
+    def __index(self, iteration_scores: ValidationIterationScores) -> None:
+        best = self._best.setdefault(iteration_scores.mode, {})
+        overall_best = self._overall_best.setdefault(iteration_scores.mode, {})
+        criteria = self.criteria
+        higher_is_better = [
+            self.evaluation_scores.higher_is_better(criterion) for criterion in criteria
+        ]
+        for dataset, dataset_scores in zip(self.datasets, iteration_scores.scores):
+            for parameters, parameter_scores in zip(self.parameters, dataset_scores):
+                for criterion, higher, score in zip(
+                    criteria, higher_is_better, parameter_scores
+                ):
+                    if score is None or math.isnan(score):
+                        continue
+                    key = (dataset, parameters, criterion)
+                    previous = best.get(key)
+                    if previous is None or (
+                        score > previous[1] if higher else score < previous[1]
+                    ):
+                        best[key] = (iteration_scores.iteration, score)
+                    previous_overall = overall_best.get((dataset, criterion))
+                    if previous_overall is None or (
+                        score > previous_overall if higher else score < previous_overall
+                    ):
+                        overall_best[(dataset, criterion)] = score
 
     def delete_after(self, iteration: int) -> None:
         self.scores = [scores for scores in self.scores if scores.iteration < iteration]
@@ -59,24 +136,33 @@ class ValidationScores:
 
     def compare(
         self, existing_iteration_scores: List[ValidationIterationScores]
-    ) -> Tuple[bool, int]:
+    ) -> Tuple[bool, List[ValidationIterationScores]]:
         """
         Compares iteration stats provided from elsewhere to scores we have saved locally.
         Local scores take priority. If local scores are at a lower iteration than the
         existing ones, delete the existing ones and replace with local.
-        If local iteration > existing iteration, just update existing scores with the last
-        overhanging local scores.
+        Otherwise, update existing scores with the local scores of each iteration and
+        mode (e.g., the full scores of an iteration of which only the fast scores
+        exist) that are not stored yet.
+
+        Returns whether to delete the existing scores, and the local scores to store.
         """
         if not existing_iteration_scores:
-            return False, 0
+            return False, list(self.scores)
         existing_iteration = (
             max([score.iteration for score in existing_iteration_scores]) + 1
         )
         current_iteration = self.validated_until()
         if existing_iteration > current_iteration:
-            return True, 0
-        else:
-            return False, existing_iteration
+            return True, list(self.scores)
+        existing = set(
+            (score.iteration, score.mode) for score in existing_iteration_scores
+        )
+        return False, [
+            score
+            for score in self.scores
+            if (score.iteration, score.mode) not in existing
+        ]
 
     @property
     def criteria(self) -> List[str]:
@@ -86,18 +172,22 @@ class ValidationScores:
     def parameter_names(self) -> List[str]:
         return self.parameters[0].parameter_names
 
-    def to_xarray(self) -> xr.DataArray:
+    def to_xarray(self, mode: str = "full") -> xr.DataArray:
+        """The scores computed in the given ``mode`` ("full" or "fast") as
+        an array with dimensions iterations, datasets, parameters and
+        criteria."""
+        scores = [
+            iteration_score
+            for iteration_score in self.scores
+            if iteration_score.mode == mode
+        ]
         return xr.DataArray(
-            np.array(
-                [iteration_score.scores for iteration_score in self.scores]
-            ).reshape(
+            np.array([iteration_score.scores for iteration_score in scores]).reshape(
                 (-1, len(self.datasets), len(self.parameters), len(self.criteria))
             ),
             dims=("iterations", "datasets", "parameters", "criteria"),
             coords={
-                "iterations": [
-                    iteration_score.iteration for iteration_score in self.scores
-                ],
+                "iterations": [iteration_score.iteration for iteration_score in scores],
                 "datasets": self.datasets,
                 "parameters": self.parameters,
                 "criteria": self.criteria,
@@ -239,7 +239,7 @@ def plot_runs(
             for dataset in run.validation_scores.datasets:
                 dataset_data = validation_score_data.sel(datasets=dataset)
                 include_validation_figure = True
-                x = [score.iteration for score in run.validation_scores.scores]
+                x = list(validation_score_data.coords["iterations"].values)
                 source_dict = {
                     "iteration": x,
                     "task": [run.task] * len(x),
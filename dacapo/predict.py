@@ -1,21 +1,36 @@
-from dacapo.gp import DaCapoArraySource
 from dacapo.experiments.model import Model
 from dacapo.experiments.datasplits.datasets.arrays import Array
 from dacapo.store.local_array_store import LocalArrayIdentifier
 from dacapo.compute_context import LocalTorch, ComputeContext
 from dacapo.experiments.datasplits.datasets.arrays.zarr_array import ZarrArray
+from dacapo.experiments.tasks.post_processors import (
+    PostProcessor,
+    PostProcessorParameters,
+)
 
 from funlib.geometry import Coordinate, Roi
-import gunpowder as gp
-import gunpowder.torch as gp_torch
+import daisy
 import numpy as np
+import numpy.typing as npt
+import torch
 import zarr
 
-from typing import Optional
+import itertools
+import multiprocessing
+import os
+from pathlib import Path
+import queue
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# a block is a pair of (read_roi, write_roi)
+Block = Tuple[Roi, Roi]
+
 
 def predict(
     model: Model,
@@ -24,14 +39,70 @@ def predict(
     num_cpu_workers: int = 4,
     compute_context: ComputeContext = LocalTorch(),
     output_roi: Optional[Roi] = None,
+    batch_size: int = 1,
+    queue_depth: int = 2,
+    output_dtype: npt.DTypeLike = np.float32,
+    resume: bool = False,
+    post_processor: Optional[PostProcessor] = None,
+    post_processor_outputs: Optional[
+        Dict[PostProcessorParameters, LocalArrayIdentifier]
+    ] = None,
+    compiled_model_dir: Optional[Path] = None,
+    mask: Optional[Array] = None,
+    is_empty: Optional[Callable[[np.ndarray], bool]] = None,
+    fill_value: Optional[float] = None,
 ):
+    """Predict with ``model`` on ``raw_array`` and store the result in the
+    array given by ``prediction_array_identifier``.
+
+    If ``num_cpu_workers`` is larger than 1, the output ROI is split into
+    chunk-aligned blocks that are distributed over that many (forked) worker
+    processes, each of which moves the model to the device itself. Otherwise,
+    or if CUDA is already initialized in the current process (which forked
+    processes can not use), all blocks are predicted in the current process,
+    where reading the next blocks, running the model, and writing finished
+    blocks happen concurrently. At most ``queue_depth`` blocks are kept in
+    memory between two of these stages.
+
+    With a ``batch_size`` larger than 1, up to that many neighbouring tiles of
+    the model's eval input shape are predicted with a single batched forward
+    pass. The result is the same as predicting every tile on its own.
+
+    Predictions are stored as ``output_dtype``. Reduced precision floats
+    (``np.float16``) are stored as they are, integer types are only supported
+    for models with a known ``output_range``. Predicted values are then scaled
+    to the full range of the integer type, reading from the prediction array
+    returns the decoded values.
+
+    Every block that has been written is recorded in a ``BlockIndex`` stored
+    with each written dataset. With ``resume``, existing datasets are kept and
+    blocks that were already written to all of them (e.g., before an
+    interrupted prediction) are skipped.
+
+    If a block-local ``post_processor`` is given, every predicted block is
+    post-processed right away with each of the parameters in
+    ``post_processor_outputs``, and only the results are written to the
+    arrays given there. The prediction itself is not stored in this case.
+
+    The model is run with the ``inference_backend`` of the
+    ``compute_context``. Models traced with TorchScript are cached in
+    ``compiled_model_dir``, if given, and loaded from there by later
+    predictions with the same block shape.
+
+    Blocks can be skipped without running the model on them: blocks that do
+    not contain any non-zero voxel of ``mask`` (found before the prediction
+    starts, without reading any raw data), and blocks for which ``is_empty``
+    returns ``True`` when called with their raw data. Skipped blocks are
+    filled with ``fill_value``, or not written at all if it is ``None``."""
+
     # get the model's input and output size
 
     input_voxel_size = Coordinate(raw_array.voxel_size)
     output_voxel_size = model.scale(input_voxel_size)
     input_shape = Coordinate(model.eval_input_shape)
     input_size = input_voxel_size * input_shape
-    output_size = output_voxel_size * model.compute_output_shape(input_shape)[1]
+    output_shape = model.compute_output_shape(input_shape)[1]
+    output_size = output_voxel_size * output_shape
 
     logger.info(
         "Predicting with input size %s, output size %s", input_size, output_size
@@ -48,79 +119,613 @@ def predict(
 
     logger.info("Total input ROI: %s, output ROI: %s", input_roi, output_roi)
 
-    # prepare prediction dataset
+    # prepare prediction or post-processed datasets
     axes = ["c"] + [axis for axis in raw_array.axes if axis != "c"]
-    ZarrArray.create_from_array_identifier(
-        prediction_array_identifier,
-        axes,
+    if post_processor is None:
+        value_range = None
+        if np.issubdtype(output_dtype, np.integer):
+            if model.output_range is None:
+                raise ValueError(
+                    f"Cannot store predictions as {np.dtype(output_dtype)}, the "
+                    "range of values predicted by the model is not known."
+                )
+            value_range = model.output_range
+        prediction_array = ZarrArray.create_from_array_identifier(
+            prediction_array_identifier,
+            axes,
+            output_roi,
+            model.num_out_channels,
+            output_voxel_size,
+            output_dtype,
+            write_size=output_size,
+            value_range=value_range,
+            overwrite=not resume,
+        )
+        written_array_identifiers = [prediction_array_identifier]
+    else:
+        if not post_processor.block_local:
+            raise ValueError(
+                f"{type(post_processor).__name__} can not be applied blockwise "
+                "during prediction"
+            )
+        assert post_processor_outputs, "No outputs given for post-processing"
+        output_arrays = {}
+        for parameters, output_array_identifier in post_processor_outputs.items():
+            # post-process a single voxel to get the channels and type of the
+            # output
+            sample = post_processor.process_block(
+                parameters,
+                np.zeros(
+                    (model.num_out_channels,) + (1,) * output_roi.dims,
+                    dtype=np.float32,
+                ),
+            )
+            has_channels = sample.ndim > output_roi.dims
+            output_arrays[parameters] = ZarrArray.create_from_array_identifier(
+                output_array_identifier,
+                axes if has_channels else axes[1:],
+                output_roi,
+                sample.shape[0] if has_channels else None,
+                output_voxel_size,
+                sample.dtype,
+                write_size=output_size,
+                overwrite=not resume,
+            )
+        written_array_identifiers = list(post_processor_outputs.values())
+    written_arrays = (
+        [prediction_array] if post_processor is None else list(output_arrays.values())
+    )
+    block_indices = [
+        BlockIndex(array_identifier) for array_identifier in written_array_identifiers
+    ]
+    if not resume:
+        for block_index in block_indices:
+            block_index.clear()
+
+    def is_done(write_roi: Roi) -> bool:
+        return all(block_index.is_done(write_roi) for block_index in block_indices)
+
+    # every block covers up to batch_size tiles, which are predicted in one
+    # forward pass
+    chunk_size = Coordinate((1,) * output_roi.dims)
+    for array in written_arrays:
+        chunk_size = Coordinate(
+            np.lcm(chunk_size, array.data.chunks[-output_roi.dims :])
+        )
+    plan = BlockPlan(
         output_roi,
-        model.num_out_channels,
+        output_size,
+        context,
+        chunk_size * output_voxel_size,
         output_voxel_size,
-        np.float32,
+        batch_size,
+    )
+    logger.info(
+        "Predicting in blocks of size %s (%d wasted voxels, %d partial chunk "
+        "writes)",
+        plan.block_size,
+        plan.wasted_voxels,
+        plan.partial_chunk_writes,
     )
 
-    # create gunpowder keys
+    network: torch.nn.Module = model
+    if plan.block_size != output_size:
+        network = BatchedTiles(model, input_shape, output_shape)
+
+    backend = compute_context.inference_backend
+    # the device is only set up by the process running the model, forked
+    # workers can not use a CUDA context of their parent
+    device = torch.device("cpu")
+    # blocks at the boundary might be smaller, keep one prepared network per
+    # block shape
+    networks: Dict[Tuple[int, ...], Callable[..., torch.Tensor]] = {}
+
+    def init_model() -> None:
+        nonlocal device
+        device = compute_context.device
+        network.to(device)
+        network.eval()
+
+    def get_network(block_input_shape: Tuple[int, ...]) -> Callable[..., torch.Tensor]:
+        if block_input_shape not in networks:
+            cache_file = None
+            if compiled_model_dir is not None and backend == "torchscript":
+                cache_file = Path(
+                    compiled_model_dir,
+                    f"{backend}_{device.type}_"
+                    + "x".join(str(s) for s in block_input_shape)
+                    + ".pt",
+                )
+            networks[block_input_shape] = _compile(
+                network,
+                backend,
+                torch.zeros(
+                    (1, model.num_in_channels) + block_input_shape, device=device
+                ),
+                cache_file,
+            )
+        return networks[block_input_shape]
+
+    def read_block(read_roi: Roi) -> np.ndarray:
+        return _read(raw_array, read_roi)
+
+    def empty_block(shape: Coordinate) -> Optional[np.ndarray]:
+        if fill_value is None:
+            return None
+        return np.full((model.num_out_channels,) + shape, fill_value, dtype=np.float32)
+
+    def predict_block(write_roi: Roi, data: np.ndarray) -> Optional[np.ndarray]:
+        if is_empty is not None and is_empty(data):
+            return empty_block(write_roi.shape / output_voxel_size)
+        with torch.no_grad():
+            out = get_network(data.shape[1:])(
+                torch.as_tensor(data[np.newaxis], device=device)
+            )
+        return out[0].cpu().numpy()
+
+    def write_block(write_roi: Roi, data: Optional[np.ndarray]) -> None:
+        if data is None:
+            # skipped and not filled
+            pass
+        elif post_processor is None:
+            _write(prediction_array, write_roi, data)
+        else:
+            for parameters, output_array in output_arrays.items():
+                _write(
+                    output_array,
+                    write_roi,
+                    post_processor.process_block(parameters, data),
+                )
+        for block_index in block_indices:
+            block_index.mark_done(write_roi)
+
+    if mask is not None:
+        skipped = [
+            write_roi
+            for _, write_roi in plan.blocks
+            if not is_done(write_roi) and not _any(mask, write_roi)
+        ]
+        logger.info("Skipping %d blocks outside of the mask", len(skipped))
+        for write_roi in skipped:
+            write_block(write_roi, empty_block(write_roi.shape / output_voxel_size))
+
+    if num_cpu_workers > 1 and torch.cuda.is_initialized():
+        logger.warning(
+            "CUDA is already initialized, predicting in a single process instead "
+            "of %d worker processes",
+            num_cpu_workers,
+        )
+        num_cpu_workers = 1
+    if num_cpu_workers > 1 and not multiprocessing.current_process().daemon:
+        _predict_blockwise(
+            init_model,
+            read_block,
+            predict_block,
+            write_block,
+            input_roi,
+            plan,
+            num_cpu_workers,
+            is_done,
+        )
+    else:
+        init_model()
+        blocks = [block for block in plan.blocks if not is_done(block[1])]
+        if resume:
+            logger.info("Resuming prediction, %d blocks left", len(blocks))
+        _predict_streaming(blocks, read_block, predict_block, write_block, queue_depth)
+
+    if post_processor is None:
+        container = zarr.open(prediction_array_identifier.container)
+        dataset = container[prediction_array_identifier.dataset]
+        dataset.attrs["axes"] = (
+            raw_array.axes if "c" in raw_array.axes else ["c"] + raw_array.axes
+        )
+
+
+def _compile(
+    network: torch.nn.Module,
+    backend: str,
+    example_input: torch.Tensor,
+    cache_file: Optional[Path] = None,
+) -> Callable[..., torch.Tensor]:
+    """Prepare ``network`` for inference on inputs shaped like
+    ``example_input`` with the given backend (see
+    ``ComputeContext.inference_backend``)."""
+
+    if backend == "eager":
+        return network
+
+    elif backend == "torchscript":
+        if cache_file is not None and cache_file.exists():
+            logger.info("Loading traced model from %s", cache_file)
+            return torch.jit.load(str(cache_file), map_location=example_input.device)
+
+        logger.info("Tracing model for input shape %s", tuple(example_input.shape))
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(network, example_input))
+
+        if cache_file is not None:
+            # other workers might be tracing the same model, write to a
+            # temporary file first to never expose a partially written file
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}")
+            torch.jit.save(traced, str(tmp_file))
+            os.replace(tmp_file, cache_file)
+        return traced
+
+    elif backend == "compile":
+        # compile for the shape of the example input only
+        return torch.compile(network, dynamic=False)
+
+    raise ValueError(f"Unknown inference backend {backend}")
+
+
+def _batch_shape(num_tiles: Coordinate, batch_size: int) -> Coordinate:
+    """Distribute up to ``batch_size`` tiles over the spatial axes. Axes along
+    which the output ROI spans more tiles are filled first, to keep the padding
+    at the boundary of the ROI small."""
+
+    batch_shape = [1] * num_tiles.dims
+    for axis in sorted(range(num_tiles.dims), key=lambda a: -num_tiles[a]):
+        batch_shape[axis] = max(1, min(batch_size, num_tiles[axis]))
+        batch_size //= batch_shape[axis]
+    return Coordinate(batch_shape)
+
+
+class BatchedTiles(torch.nn.Module):
+    """Wraps a model to predict on an input that covers a grid of tiles.
+
+    The input is cut into overlapping tiles of the model's ``input_shape``
+    (with a stride of ``output_shape``), all tiles are passed through the
+    model as one batch, and the resulting ``output_shape`` tiles are stitched
+    back together.
+    """
+
+    def __init__(
+        self, model: torch.nn.Module, input_shape: Coordinate, output_shape: Coordinate
+    ):
+        super().__init__()
+        self.model = model
+        self.input_shape = input_shape
+        self.output_shape = output_shape
 
-    raw = gp.ArrayKey("RAW")
-    prediction = gp.ArrayKey("PREDICTION")
+    def forward(self, x):
+        dims = self.input_shape.dims
 
-    # assemble prediction pipeline
+        # x: (1, c, *spatial)
+        tiles = x[0]
+        for d in range(dims):
+            tiles = tiles.unfold(1 + d, self.input_shape[d], self.output_shape[d])
+        # tiles: (c, *num_tiles, *input_shape)
+        num_tiles = tuple(tiles.shape[1 : 1 + dims])
+        tiles = tiles.permute(
+            tuple(range(1, 1 + dims)) + (0,) + tuple(range(1 + dims, 1 + 2 * dims))
+        ).reshape((-1, x.shape[1]) + tuple(self.input_shape))
+        # tiles: (b, c, *input_shape)
 
-    # prepare data source
-    pipeline = DaCapoArraySource(raw_array, raw)
-    # raw: (c, d, h, w)
-    pipeline += gp.Pad(raw, Coordinate((None,) * input_voxel_size.dims))
-    # raw: (c, d, h, w)
-    pipeline += gp.Unsqueeze([raw])
-    # raw: (1, c, d, h, w)
+        out = self.model(tiles)
+        # out: (b, c', *output_shape)
 
-    gt_padding = (output_size - output_roi.shape) % output_size
-    prediction_roi = output_roi.grow(gt_padding)
+        channels = out.shape[1]
+        out = out.reshape(num_tiles + (channels,) + tuple(self.output_shape))
+        # interleave tile indices and tile shape: (c', n_0, o_0, n_1, o_1, ...)
+        out = out.permute(
+            (dims,) + tuple(i for d in range(dims) for i in (d, dims + 1 + d))
+        )
+        return out.reshape(
+            (1, channels) + tuple(n * o for n, o in zip(num_tiles, self.output_shape))
+        )
 
-    # predict
-    pipeline += gp_torch.Predict(
-        model=model,
-        inputs={"x": raw},
-        outputs={0: prediction},
-        array_specs={
-            prediction: gp.ArraySpec(
-                roi=prediction_roi, voxel_size=output_voxel_size, dtype=np.float32
+
+class BlockIndex:
+    """Keeps track of the blocks written to a dataset.
+
+    Every written block is marked by an empty file named after its write ROI,
+    in a directory inside the dataset. Markers are only created after a block
+    has been written completely, and workers never mark the same block, so
+    the index can be shared by any number of worker processes. Removing the
+    dataset removes the index as well.
+    """
+
+    def __init__(self, array_identifier: LocalArrayIdentifier):
+        self.path = (
+            Path(array_identifier.container) / array_identifier.dataset / ".blocks"
+        )
+
+    def _marker(self, write_roi: Roi) -> Path:
+        return self.path / "_".join(
+            str(c) for c in tuple(write_roi.offset) + tuple(write_roi.shape)
+        )
+
+    def is_done(self, write_roi: Roi) -> bool:
+        return self._marker(write_roi).exists()
+
+    def mark_done(self, write_roi: Roi) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._marker(write_roi).touch()
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class BlockPlan:
+    """Plans the blocks in which ``output_roi`` is predicted, in tiles of the
+    model's output size ``tile_size``.
+
+    Block sizes are multiples of the tile size and of the ``chunk_size`` of
+    the output datasets, and blocks are aligned with the chunks, such that
+    every chunk is written by exactly one block. A block covers up to
+    ``max_tiles`` tiles (more only if a single chunk spans more tiles). Blocks
+    at the upper boundary of ``output_roi`` are shrunk to the tiles needed to
+    cover it.
+    """
+
+    def __init__(
+        self,
+        output_roi: Roi,
+        tile_size: Coordinate,
+        context: Coordinate,
+        chunk_size: Coordinate,
+        voxel_size: Coordinate,
+        max_tiles: int = 1,
+    ):
+        assert not output_roi.unbounded, "Can not plan blocks for an unbounded ROI"
+        self.output_roi = output_roi
+        self.tile_size = tile_size
+        self.context = context
+        self.chunk_size = chunk_size
+        self.voxel_size = voxel_size
+
+        # the smallest chunk-aligned block made of whole tiles
+        unit = Coordinate(np.lcm(tile_size, chunk_size))
+        tiles_per_unit = int(np.prod(unit / tile_size))
+        num_units = Coordinate(-(-s // u) for s, u in zip(output_roi.shape, unit))
+        self.block_size = unit * _batch_shape(
+            num_units, max(1, max_tiles // tiles_per_unit)
+        )
+
+    def block(self, write_roi: Roi) -> Block:
+        """Get the read and write ROI of the block with the given (full-size)
+        ``write_roi``, shrunk to the tiles needed to cover ``output_roi``."""
+
+        end = Coordinate(min(a, b) for a, b in zip(write_roi.end, self.output_roi.end))
+        num_tiles = Coordinate(
+            -(-(e - b) // t) for e, b, t in zip(end, write_roi.begin, self.tile_size)
+        )
+        write_roi = Roi(write_roi.begin, num_tiles * self.tile_size)
+        return write_roi.grow(self.context, self.context), write_roi
+
+    @property
+    def blocks(self) -> List[Block]:
+        num_blocks = [
+            -(-s // b) for s, b in zip(self.output_roi.shape, self.block_size)
+        ]
+        return [
+            self.block(
+                Roi(
+                    self.output_roi.offset + Coordinate(index) * self.block_size,
+                    self.block_size,
+                )
             )
-        },
-        spawn_subprocess=False,
-        device=str(compute_context.device),
+            for index in itertools.product(*(range(n) for n in num_blocks))
+        ]
+
+    @property
+    def wasted_voxels(self) -> int:
+        """The number of voxels predicted outside of ``output_roi``."""
+
+        predicted = sum(
+            int(np.prod(write_roi.shape / self.voxel_size))
+            for _, write_roi in self.blocks
+        )
+        return predicted - int(np.prod(self.output_roi.shape / self.voxel_size))
+
+    @property
+    def partial_chunk_writes(self) -> int:
+        """The number of chunk writes that only cover a part of a chunk (inside
+        of ``output_roi``), which requires the chunk to be read first."""
+
+        count = 0
+        for _, write_roi in self.blocks:
+            valid_roi = write_roi.intersect(self.output_roi)
+            begin = (valid_roi.begin - self.output_roi.begin) / self.chunk_size
+            end = [
+                -(-(e - o) // c)
+                for e, o, c in zip(
+                    valid_roi.end, self.output_roi.begin, self.chunk_size
+                )
+            ]
+            for index in itertools.product(*(range(b, e) for b, e in zip(begin, end))):
+                chunk_roi = Roi(
+                    self.output_roi.begin + Coordinate(index) * self.chunk_size,
+                    self.chunk_size,
+                ).intersect(self.output_roi)
+                if not valid_roi.contains(chunk_roi):
+                    count += 1
+        return count
+
+
+def _any(array: Array, roi: Roi) -> bool:
+    """Check whether ``array`` contains any non-zero value in ``roi``."""
+
+    roi = roi.snap_to_grid(array.voxel_size, mode="grow").intersect(array.roi)
+    if roi.empty:
+        return False
+    return bool(np.any(array[roi]))
+
+
+def _read(array: Array, roi: Roi) -> np.ndarray:
+    """Read ``roi`` from ``array`` with a leading channel dimension. Parts of
+    ``roi`` outside of the array are filled with zeros."""
+
+    valid_roi = roi.intersect(array.roi)
+    if valid_roi.empty:
+        num_channels = array.num_channels if array.num_channels is not None else 1
+        return np.zeros(
+            (num_channels,) + roi.shape / array.voxel_size, dtype=array.dtype
+        )
+
+    data = array[valid_roi]
+    if "c" not in array.axes:
+        data = data[np.newaxis]
+    if valid_roi != roi:
+        pad_before = (valid_roi.begin - roi.begin) / array.voxel_size
+        pad_after = (roi.end - valid_roi.end) / array.voxel_size
+        data = np.pad(data, [(0, 0)] + list(zip(pad_before, pad_after)))
+    return data
+
+
+def _write(array: ZarrArray, roi: Roi, data: np.ndarray) -> None:
+    """Write the part of ``data`` (covering ``roi``) that lies inside
+    ``array``."""
+
+    valid_roi = roi.intersect(array.roi)
+    if valid_roi.empty:
+        return
+    offset = (valid_roi.begin - roi.begin) / array.voxel_size
+    shape = valid_roi.shape / array.voxel_size
+    slices = (slice(None),) * (data.ndim - roi.dims) + tuple(
+        slice(o, o + s) for o, s in zip(offset, shape)
     )
-    # raw: (1, c, d, h, w)
-    # prediction: (1, [c,] d, h, w)
-
-    # prepare writing
-    pipeline += gp.Squeeze([raw, prediction])
-    # raw: (c, d, h, w)
-    # prediction: (c, d, h, w)
-    # raw: (c, d, h, w)
-    # prediction: (c, d, h, w)
-
-    # write to zarr
-    pipeline += gp.ZarrWrite(
-        {prediction: prediction_array_identifier.dataset},
-        prediction_array_identifier.container.parent,
-        prediction_array_identifier.container.name,
-        dataset_dtypes={prediction: np.float32},
+    array[valid_roi] = data[slices]
+
+
+def _predict_streaming(
+    blocks: Iterable[Block],
+    read_block: Callable[[Roi], np.ndarray],
+    predict_block: Callable[[Roi, np.ndarray], Optional[np.ndarray]],
+    write_block: Callable[[Roi, Optional[np.ndarray]], None],
+    queue_depth: int,
+):
+    """Predict all ``blocks`` in the current process.
+
+    A reader thread fetches the inputs of the next blocks while the model runs
+    on the current block, and a writer thread stores finished blocks. The
+    stages are connected by queues holding at most ``queue_depth`` blocks.
+    """
+
+    assert queue_depth > 0, "queue_depth has to be at least 1"
+
+    read_queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+    write_queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    timings = {"read": 0.0, "predict": 0.0, "write": 0.0}
+
+    def read_worker():
+        try:
+            for read_roi, write_roi in blocks:
+                if stop.is_set():
+                    break
+                start = time.perf_counter()
+                data = read_block(read_roi)
+                timings["read"] += time.perf_counter() - start
+                read_queue.put((write_roi, data))
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            read_queue.put(None)
+
+    def write_worker():
+        for write_roi, data in iter(write_queue.get, None):
+            # keep draining the queue after a failure
+            if stop.is_set():
+                continue
+            try:
+                start = time.perf_counter()
+                write_block(write_roi, data)
+                timings["write"] += time.perf_counter() - start
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+    reader = threading.Thread(target=read_worker, name="predict-read", daemon=True)
+    writer = threading.Thread(target=write_worker, name="predict-write", daemon=True)
+    reader.start()
+    writer.start()
+
+    start_time = time.perf_counter()
+    try:
+        for write_roi, data in iter(read_queue.get, None):
+            if stop.is_set():
+                continue
+            start = time.perf_counter()
+            prediction = predict_block(write_roi, data)
+            timings["predict"] += time.perf_counter() - start
+            write_queue.put((write_roi, prediction))
+    except BaseException:
+        stop.set()
+        # unblock the reader, it stops before the next block
+        while reader.is_alive():
+            try:
+                read_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        raise
+    finally:
+        write_queue.put(None)
+        reader.join()
+        writer.join()
+
+    if errors:
+        raise errors[0]
+
+    logger.info(
+        "Prediction took %.2fs (read: %.2fs, predict: %.2fs, write: %.2fs)",
+        time.perf_counter() - start_time,
+        timings["read"],
+        timings["predict"],
+        timings["write"],
     )
 
-    # create reference batch request
-    ref_request = gp.BatchRequest()
-    ref_request.add(raw, input_size)
-    ref_request.add(prediction, output_size)
-    pipeline += gp.Scan(ref_request)
 
-    # build pipeline and predict in complete output ROI
+def _predict_blockwise(
+    init_worker: Callable[[], None],
+    read_block: Callable[[Roi], np.ndarray],
+    predict_block: Callable[[Roi, np.ndarray], Optional[np.ndarray]],
+    write_block: Callable[[Roi, Optional[np.ndarray]], None],
+    input_roi: Roi,
+    plan: BlockPlan,
+    num_workers: int,
+    is_done: Callable[[Roi], bool],
+):
+    """Predict in ``num_workers`` processes, each of which calls
+    ``init_worker`` once before processing blocks. Blocks for which
+    ``is_done`` returns ``True`` for their write ROI are skipped.
+
+    Blocks of the ``plan`` are distributed to the workers by daisy until the
+    whole ``input_roi`` is covered. Blocks are aligned with the chunks of the
+    output datasets, so workers never write to the same chunk.
+    """
 
-    with gp.build(pipeline):
-        pipeline.request_batch(gp.BatchRequest())
+    # share the available cores between the workers instead of letting every
+    # worker's torch use all of them
+    num_threads = max(1, multiprocessing.cpu_count() // num_workers)
 
-    container = zarr.open(prediction_array_identifier.container)
-    dataset = container[prediction_array_identifier.dataset]
-    dataset.attrs["axes"] = (
-        raw_array.axes if "c" in raw_array.axes else ["c"] + raw_array.axes
+    def predict_worker():
+        torch.set_num_threads(num_threads)
+        init_worker()
+        client = daisy.Client()
+        while True:
+            with client.acquire_block() as block:
+                if block is None:
+                    break
+                read_roi, write_roi = plan.block(block.write_roi)
+                write_block(write_roi, predict_block(write_roi, read_block(read_roi)))
+
+    task = daisy.Task(
+        "predict",
+        total_roi=input_roi,
+        read_roi=Roi((0,) * plan.context.dims, plan.block_size + plan.context * 2),
+        write_roi=Roi(plan.context, plan.block_size),
+        process_function=predict_worker,
+        check_function=lambda block: is_done(plan.block(block.write_roi)[1]),
+        read_write_conflict=False,
+        fit="overhang",
+        num_workers=num_workers,
     )
+
+    logger.info("Predicting blockwise with %d workers", num_workers)
+    if not daisy.run_blockwise([task]):
+        raise RuntimeError("Prediction failed for at least one block")
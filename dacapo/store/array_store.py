@@ -61,11 +61,26 @@ class ArrayStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def validation_input_cache(self, key: str) -> LocalArrayIdentifier:
+        """Get the array identifier for a cached validation input, shared
+        between runs. ``key`` identifies the content of the array."""
+        pass
+
     @abstractmethod
     def remove(self, array_identifier: LocalArrayIdentifier) -> None:
         """Remove an array by its identifier."""
         pass
 
+    @abstractmethod
+    def link(
+        self,
+        array_identifier: LocalArrayIdentifier,
+        link_identifier: LocalArrayIdentifier,
+    ) -> None:
+        """Make an existing array available under another identifier."""
+        pass
+
     @abstractmethod
     def snapshot_container(self, run_name: str) -> LocalContainerIdentifier:
         """
@@ -1,7 +1,7 @@
 from .stats_store import StatsStore
 from .converter import converter
 from dacapo.experiments import TrainingStats, TrainingIterationStats
-from dacapo.experiments import ValidationScores, ValidationIterationScores
+from dacapo.experiments import ValidationIterationScores
 from typing import List
 
 import logging
@@ -57,22 +57,22 @@ class FileStatsStore(StatsStore):
 
     def store_validation_iteration_scores(self, run_name, scores):
         existing_iteration_scores = self.__read_validation_iteration_scores(run_name)
-        store_from_iteration, drop_db = scores.compare(existing_iteration_scores)
+        drop_db, new_iteration_scores = scores.compare(existing_iteration_scores)
 
         if drop_db:
             # current scores are behind DB--drop DB
             logger.warn("Overwriting previous validation scores for run %s", run_name)
             self.__delete_validation_iteration_scores(run_name)
-
-        if store_from_iteration > 0:
+            existing_iteration_scores = []
+        elif existing_iteration_scores and new_iteration_scores:
             logger.info(
-                "Updating validation scores of run %s after iteration " "%d",
+                "Updating validation scores of run %s with %d new iteration scores",
                 run_name,
-                store_from_iteration,
+                len(new_iteration_scores),
             )
 
         self.__store_validation_iteration_scores(
-            scores, store_from_iteration, scores.validated_until() + 1, run_name
+            existing_iteration_scores + new_iteration_scores, run_name
         )
 
     def retrieve_validation_iteration_scores(self, run_name):
@@ -105,13 +105,9 @@ class FileStatsStore(StatsStore):
             file_store.unlink()
 
     def __store_validation_iteration_scores(
-        self, validation_scores: ValidationScores, begin: int, end: int, run_name: str
+        self, iteration_scores: List[ValidationIterationScores], run_name: str
     ) -> None:
-        docs = [
-            converter.unstructure(scores)
-            for scores in validation_scores.scores
-            if scores.iteration < end
-        ]
+        docs = [converter.unstructure(scores) for scores in iteration_scores]
         for doc in docs:
             doc.update({"run_name": run_name})
 
@@ -1,5 +1,7 @@
 from .array_store import ArrayStore, LocalArrayIdentifier, LocalContainerIdentifier
 
+import zarr
+
 from pathlib import Path
 import logging
 import shutil
@@ -69,6 +71,15 @@ class LocalArrayStore(ArrayStore):
             LocalArrayIdentifier(container, f"{dataset_prefix}/gt"),
         )
 
+    def validation_input_cache(self, key: str) -> LocalArrayIdentifier:
+        """
+        Get the array identifier for a cached validation input, shared between
+        runs. ``key`` identifies the content of the array.
+        """
+        return LocalArrayIdentifier(
+            Path(self.basedir, "validation_inputs.zarr"), f"{key}"
+        )
+
     def snapshot_container(self, run_name: str) -> LocalContainerIdentifier:
         """
         Get a container identifier for storage of a snapshot.
@@ -96,6 +107,11 @@ class LocalArrayStore(ArrayStore):
 
         path = Path(container, dataset)
 
+        if path.is_symlink():
+            logger.info("Removing link %s in container %s", dataset, container)
+            path.unlink()
+            return
+
         if not path.exists():
             logger.warning(
                 "Asked to remove dataset %s in container %s, but it doesn't exist.",
@@ -116,5 +132,27 @@ class LocalArrayStore(ArrayStore):
         logger.info("Removing dataset %s in container %s", dataset, container)
         shutil.rmtree(path)
 
+    def link(
+        self,
+        array_identifier: LocalArrayIdentifier,
+        link_identifier: LocalArrayIdentifier,
+    ) -> None:
+        """Make an existing array available under another identifier, through
+        a symbolic link to the array's dataset."""
+
+        path = Path(link_identifier.container, link_identifier.dataset)
+        group = str(Path(link_identifier.dataset).parent)
+        if group != ".":
+            zarr.open(str(link_identifier.container), "a").require_group(group)
+        else:
+            zarr.open(str(link_identifier.container), "a")
+
+        if path.is_symlink() or path.exists():
+            self.remove(link_identifier)
+        path.symlink_to(
+            Path(array_identifier.container, array_identifier.dataset).resolve(),
+            target_is_directory=True,
+        )
+
     def __get_run_dir(self, run_name: str) -> Path:
         return Path(self.basedir, run_name)
@@ -5,6 +5,7 @@ import torch
 
 import json
 from pathlib import Path
+import shutil
 import logging
 from typing import Optional, Union
 
@@ -77,6 +78,13 @@ class LocalWeightsStore(WeightsStore):
     def remove(self, run: str, iteration: int):
         weights = self.__get_weights_dir(run) / "iterations" / str(iteration)
         weights.unlink()
+        shutil.rmtree(self.compiled_model_dir(run, iteration), ignore_errors=True)
+
+    def compiled_model_dir(self, run: str, iteration: int) -> Path:
+        """Return the directory in which compiled versions of the model of the
+        given run/iteration are cached."""
+
+        return self.__get_weights_dir(run) / "compiled" / str(iteration)
 
     def store_best(self, run: str, iteration: int, dataset: str, criterion: str):
         """
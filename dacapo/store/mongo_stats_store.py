@@ -68,23 +68,20 @@ class MongoStatsStore(StatsStore):
     ):
         existing_iteration_scores = self.__read_validation_iteration_scores(run_name)
 
-        drop_db, store_from_iteration = scores.compare(existing_iteration_scores)
+        drop_db, new_iteration_scores = scores.compare(existing_iteration_scores)
 
         if drop_db:
             # current scores are behind DB--drop DB
             logger.warn("Overwriting previous validation scores for run %s", run_name)
             self.__delete_validation_scores(run_name)
-
-        if store_from_iteration > 0:
+        elif existing_iteration_scores and new_iteration_scores:
             logger.info(
-                "Updating validation scores of run %s after iteration " "%d",
+                "Updating validation scores of run %s with %d new iteration scores",
                 run_name,
-                store_from_iteration,
+                len(new_iteration_scores),
             )
 
-        self.__store_validation_iteration_scores(
-            scores, store_from_iteration, scores.validated_until() + 1, run_name
-        )
+        self.__store_validation_iteration_scores(new_iteration_scores, run_name)
 
     def retrieve_validation_iteration_scores(
         self,
@@ -134,16 +131,10 @@ class MongoStatsStore(StatsStore):
 
     def __store_validation_iteration_scores(
         self,
-        validation_scores: ValidationScores,
-        begin: int,
-        end: int,
+        iteration_scores: List[ValidationIterationScores],
         run_name: str,
     ) -> None:
-        docs = [
-            converter.unstructure(scores)
-            for scores in validation_scores.scores
-            if scores.iteration >= begin and scores.iteration < end
-        ]
+        docs = [converter.unstructure(scores) for scores in iteration_scores]
         for doc in docs:
             doc.update({"run_name": run_name})
 
@@ -198,9 +189,13 @@ class MongoStatsStore(StatsStore):
             name="run_it",
             unique=True,
         )
+        if "run_it_ds" in self.validation_scores.index_information():
+            # replaced by an index that allows fast and full scores of the
+            # same iteration
+            self.validation_scores.drop_index("run_it_ds")
         self.validation_scores.create_index(
-            [("run_name", ASCENDING), ("iteration", ASCENDING), ("dataset", ASCENDING)],
-            name="run_it_ds",
+            [("run_name", ASCENDING), ("iteration", ASCENDING), ("mode", ASCENDING)],
+            name="run_it_mode",
             unique=True,
         )
         self.training_stats.create_index([("iteration", ASCENDING)], name="it")
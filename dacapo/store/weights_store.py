@@ -3,6 +3,7 @@ from dacapo.experiments.run import Run
 import torch
 
 from abc import ABC, abstractmethod
+from pathlib import Path
 from typing import Optional
 from collections import OrderedDict
 
@@ -57,6 +58,12 @@ class WeightsStore(ABC):
         """
         pass
 
+    def compiled_model_dir(self, run: str, iteration: int) -> Optional[Path]:
+        """Return a directory to cache compiled versions of the model of the
+        given run/iteration in, or ``None`` if this store does not support
+        that."""
+        return None
+
     @abstractmethod
     def retrieve_best(self, run: str, dataset: str, criterion: str) -> int:
         """
@@ -1,13 +1,17 @@
 from dacapo.store.create_store import create_array_store
-from .experiments import Run
+from .experiments import Run, ValidationIterationScores
 from .compute_context import LocalTorch, ComputeContext
 from .store import create_config_store, create_stats_store, create_weights_store
-from .validate import validate_run
+from .validate import merge_validation_scores, validate_run
 
 import torch
 from tqdm import tqdm
 
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 import logging
+import multiprocessing
+from typing import Deque, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +38,22 @@ def train(run_name: str, compute_context: ComputeContext = LocalTorch()):
 def train_run(
     run: Run,
     compute_context: ComputeContext = LocalTorch(),
+    validate_in_background: bool = False,
+    validation_compute_context: Optional[ComputeContext] = None,
+    max_validations_in_flight: int = 1,
 ):
+    """Train a run, validating it every ``validation_interval`` iterations.
+
+    With ``validate_in_background``, stored checkpoints are validated in
+    separate worker processes (using ``validation_compute_context``, or the
+    training ``compute_context`` if not given) while training continues. At
+    most ``max_validations_in_flight`` validations run at the same time,
+    training waits for the oldest one to finish before starting another.
+    Scores are merged into the run's validation scores in the order of their
+    iterations, as soon as they are available. Only then are they stored and
+    used to update the best validation arrays and weights, so that
+    overlapping validations do not compete for them."""
+
     logger.info("Starting/resuming training for run %s...", run)
 
     # create run
@@ -122,6 +141,37 @@ def train_run(
         array_store.snapshot_container(run.name),
     )
 
+    if validation_compute_context is None:
+        validation_compute_context = compute_context
+    validation_executor = None
+    validations: Deque[Future] = deque()
+    if validate_in_background:
+        assert max_validations_in_flight > 0
+        # spawn, to not inherit the training process' CUDA context
+        validation_executor = ProcessPoolExecutor(
+            max_validations_in_flight,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def merge_validations(max_in_flight: int) -> None:
+        # merge finished validations, in order, and wait for the oldest
+        # ones until at most max_in_flight are left
+        while validations and (
+            validations[0].done() or len(validations) > max_in_flight
+        ):
+            iteration_scores = validations.popleft().result()
+            if not iteration_scores:
+                continue
+            for scores in iteration_scores:
+                merge_validation_scores(run, scores)
+            stats_store.store_validation_iteration_scores(
+                run.name, run.validation_scores
+            )
+            logger.info(
+                "Merged validation scores of iteration %d",
+                iteration_scores[0].iteration,
+            )
+
     with run.trainer as trainer:
         while trained_until < run.train_until:
             # train for at most 100 iterations at a time, then store training stats
@@ -144,14 +194,31 @@ def train_run(
                     break
 
             trained_until = run.training_stats.trained_until()
+            merge_validations(max_validations_in_flight)
 
             # If this is not a validation iteration or final iteration, skip validation
-            no_its = iteration_stats is None  # No training steps run
+            if iteration_stats is None:  # No training steps run
+                stats_store.store_training_stats(run.name, run.training_stats)
+                continue
             validation_it = (
                 iteration_stats.iteration + 1
             ) % run.validation_interval == 0
             final_it = trained_until >= run.train_until
-            if no_its or (not validation_it and not final_it):
+            if not validation_it and not final_it:
+                stats_store.store_training_stats(run.name, run.training_stats)
+                continue
+
+            if validation_executor is not None:
+                weights_store.store_weights(run, iteration_stats.iteration + 1)
+                merge_validations(max_validations_in_flight - 1)
+                validations.append(
+                    validation_executor.submit(
+                        _validate_checkpoint,
+                        run.name,
+                        iteration_stats.iteration + 1,
+                        validation_compute_context,
+                    )
+                )
                 stats_store.store_training_stats(run.name, run.training_stats)
                 continue
 
@@ -178,4 +245,38 @@ def train_run(
             weights_store.store_weights(run, run.training_stats.trained_until())
             stats_store.store_training_stats(run.name, run.training_stats)
 
+    if validation_executor is not None:
+        merge_validations(0)
+        validation_executor.shutdown()
+
     logger.info("Trained until %d, finished.", trained_until)
+
+
+def _validate_checkpoint(
+    run_name: str, iteration: int, compute_context: ComputeContext
+) -> List[ValidationIterationScores]:
+    """Validate the stored checkpoint of a run at the given iteration, in a
+    background worker process. Returns the scores of this iteration (fast
+    and/or full, see ``validate_run``), which are neither stored nor used for
+    the best validations yet (see ``merge_validation_scores``)."""
+
+    config_store = create_config_store()
+    run = Run(config_store.retrieve_run_config(run_name))
+
+    # previous scores are needed to find the best iterations
+    stats_store = create_stats_store()
+    run.validation_scores.scores = stats_store.retrieve_validation_iteration_scores(
+        run_name
+    )
+    run.validation_scores.delete_after(iteration)
+
+    weights = create_weights_store().retrieve_weights(run_name, iteration)
+    run.model.load_state_dict(weights.model)
+
+    validate_run(run, iteration, compute_context=compute_context, update_stores=False)
+
+    return [
+        iteration_scores
+        for iteration_scores in run.validation_scores.scores
+        if iteration_scores.iteration == iteration
+    ]
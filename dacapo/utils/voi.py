@@ -9,6 +9,8 @@
 import numpy as np
 import scipy.sparse as sparse
 
+from typing import List, Tuple
+
 
 def voi(reconstruction, groundtruth, ignore_reconstruction=[], ignore_groundtruth=[0]):
     """Return the conditional entropies of the variation of information metric. [1]
@@ -80,6 +82,11 @@ def split_vi(x, y=None, ignore_x=[0], ignore_y=[0]):
     --------
     vi
     """
+    if y is not None:
+        table = ContingencyTable()
+        table.add(x, y)
+        hxgy, hygx = table.voi(ignore_x, ignore_y)
+        return np.array([hygx, hxgy])
     _, _, _, hxgy, hygx, _, _ = vi_tables(x, y, ignore_x, ignore_y)
     # false merges, false splits
     return np.array([hygx.sum(), hxgy.sum()])
@@ -165,21 +172,178 @@ def contingency_table(seg, gt, ignore_seg=[0], ignore_gt=[0], norm=True):
         labeled `i` in `seg` and `j` in `gt`. (Or the proportion of such voxels
         if `norm=True`.)
     """
-    segr = seg.ravel()
-    gtr = gt.ravel()
-    ignored = np.zeros(segr.shape, bool)
-    data = np.ones(len(gtr))
-    for i in ignore_seg:
-        ignored[segr == i] = True
-    for j in ignore_gt:
-        ignored[gtr == j] = True
-    data[ignored] = 0
-    cont = sparse.coo_matrix((data, (segr, gtr))).tocsc()
+    table = ContingencyTable()
+    table.add(seg, gt)
+    keep = np.logical_not(
+        np.logical_or(
+            np.isin(table.segmentation, ignore_seg),
+            np.isin(table.ground_truth, ignore_gt),
+        )
+    )
+    cont = sparse.coo_matrix(
+        (
+            table.counts[keep].astype(np.float64),
+            (table.segmentation[keep], table.ground_truth[keep]),
+        ),
+        shape=(int(seg.max()) + 1, int(gt.max()) + 1),
+    ).tocsc()
     if norm:
         cont /= float(cont.sum())
     return cont
 
 
+class ContingencyTable:
+    """A sparse contingency table of a segmentation and a ground-truth
+    segmentation: the number of voxels for each pair of labels that occurs.
+
+    Tables can be accumulated block by block with ``add``, and tables of
+    separate blocks (e.g., computed by separate workers) can be merged with
+    ``merge`` before computing the variation of information.
+    """
+
+    def __init__(self):
+        self.segmentation = np.zeros((0,), dtype=np.uint64)
+        self.ground_truth = np.zeros((0,), dtype=np.uint64)
+        self.counts = np.zeros((0,), dtype=np.uint64)
+
+    def add(self, segmentation: np.ndarray, ground_truth: np.ndarray) -> None:
+        """Count the label pairs of ``segmentation`` and ``ground_truth``.
+
+        The labels can be of any integer type, they are not copied or cast.
+        Labels are remapped to compact ids, such that every pair of ids can
+        be counted with a single ``bincount`` (or a sort, if there are more
+        pairs of ids than voxels). The table keeps the labels as ``int64``
+        for signed and as ``uint64`` for unsigned label types."""
+        seg_labels, seg_ids = compact_labels(segmentation)
+        gt_labels, gt_ids = compact_labels(ground_truth)
+        pairs = seg_ids.astype(np.int64)
+        pairs *= len(gt_labels)
+        pairs += gt_ids
+        if len(seg_labels) * len(gt_labels) <= pairs.size:
+            counts = np.bincount(pairs, minlength=len(seg_labels) * len(gt_labels))
+            pairs = np.flatnonzero(counts)
+            counts = counts[pairs]
+        else:
+            pairs, counts = np.unique(pairs, return_counts=True)
+        self._add_counts(
+            seg_labels.astype(_label_type(segmentation))[pairs // len(gt_labels)],
+            gt_labels.astype(_label_type(ground_truth))[pairs % len(gt_labels)],
+            counts.astype(np.uint64),
+        )
+
+    def merge(self, other: "ContingencyTable") -> None:
+        """Add the counts of another table to this one."""
+        self._add_counts(other.segmentation, other.ground_truth, other.counts)
+
+    def _add_counts(
+        self, segmentation: np.ndarray, ground_truth: np.ndarray, counts: np.ndarray
+    ) -> None:
+        # the label pairs of each table are unique and sorted
+        if len(self.counts) == 0:
+            self.segmentation = segmentation
+            self.ground_truth = ground_truth
+            self.counts = counts
+            return
+        segmentation = np.concatenate(
+            _common_label_type(self.segmentation, segmentation)
+        )
+        ground_truth = np.concatenate(
+            _common_label_type(self.ground_truth, ground_truth)
+        )
+        counts = np.concatenate([self.counts, counts])
+        if len(counts) == 0:
+            return
+        order = np.lexsort((ground_truth, segmentation))
+        segmentation = segmentation[order]
+        ground_truth = ground_truth[order]
+        starts = np.ones((len(order),), dtype=bool)
+        starts[1:] = np.logical_or(
+            segmentation[1:] != segmentation[:-1], ground_truth[1:] != ground_truth[:-1]
+        )
+        starts = np.flatnonzero(starts)
+        self.segmentation = segmentation[starts]
+        self.ground_truth = ground_truth[starts]
+        self.counts = np.add.reduceat(counts[order], starts)
+
+    def voi(
+        self,
+        ignore_segmentation: List[int] = [],
+        ignore_ground_truth: List[int] = [0],
+    ) -> Tuple[float, float]:
+        """Compute the variation of information split and merge error (see
+        ``voi``), ignoring voxels with a label in ``ignore_segmentation`` in
+        the segmentation or in ``ignore_ground_truth`` in the ground truth."""
+
+        keep = np.logical_not(
+            np.logical_or(
+                np.isin(self.segmentation, ignore_segmentation),
+                np.isin(self.ground_truth, ignore_ground_truth),
+            )
+        )
+        counts = self.counts[keep].astype(np.float64)
+        total = counts.sum()
+        if total == 0:
+            return 0.0, 0.0
+        _, rows = compact_labels(self.segmentation[keep])
+        _, columns = compact_labels(self.ground_truth[keep])
+        pxy = counts / total
+        px = np.bincount(rows, weights=pxy)
+        py = np.bincount(columns, weights=pxy)
+        # H(X|Y) and H(Y|X)
+        split = float(np.sum(pxy * np.log2(py[columns] / pxy)))
+        merge = float(np.sum(pxy * np.log2(px[rows] / pxy)))
+        return split, merge
+
+
+def _label_type(labels: np.ndarray) -> type:
+    """The type in which a ``ContingencyTable`` keeps ``labels``."""
+    return np.int64 if np.issubdtype(labels.dtype, np.signedinteger) else np.uint64
+
+
+def _common_label_type(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cast two arrays of labels (``int64`` or ``uint64``) to the same type,
+    without changing any of the labels."""
+    if a.dtype == b.dtype:
+        return a, b
+    signed, unsigned = (a, b) if a.dtype == np.int64 else (b, a)
+    if len(unsigned) == 0 or unsigned.max() <= np.iinfo(np.int64).max:
+        unsigned = unsigned.astype(np.int64)
+    elif len(signed) == 0 or signed.min() >= 0:
+        signed = signed.astype(np.uint64)
+    else:
+        raise ValueError(
+            "Can not count negative labels together with labels larger than "
+            "2**63 - 1"
+        )
+    return (signed, unsigned) if a.dtype == np.int64 else (unsigned, signed)
+
+
+def compact_labels(labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Remap ``labels`` to compact ids. Returns the sorted unique labels and
+    the (flattened) id of each voxel, i.e., its index in the unique labels,
+    in the smallest unsigned integer type that fits all ids.
+
+    Small non-negative labels are remapped with a lookup table, without
+    copying ``labels``, others by sorting."""
+    labels = labels.ravel()
+    if (
+        labels.size > 0
+        and np.issubdtype(labels.dtype, np.integer)
+        and labels.min() >= 0
+        and labels.max() < labels.size
+    ):
+        present = np.zeros((int(labels.max()) + 1,), dtype=bool)
+        present[labels] = True
+        unique = np.flatnonzero(present)
+        lookup = np.zeros(
+            present.shape, dtype=np.min_scalar_type(max(len(unique) - 1, 0))
+        )
+        lookup[unique] = np.arange(len(unique))
+        return unique, lookup[labels]
+    unique, ids = np.unique(labels, return_inverse=True)
+    return unique, ids.reshape(-1).astype(np.min_scalar_type(max(len(unique) - 1, 0)))
+
+
 def divide_columns(matrix, row, in_place=False):
     """Divide each column of `matrix` by the corresponding element in `row`.
 
@@ -1,18 +1,31 @@
 from .predict import predict
 from .compute_context import LocalTorch, ComputeContext
 from .experiments import Run, ValidationIterationScores
-from .experiments.datasplits.datasets.arrays import ZarrArray
+from .experiments.datasplits.datasets.arrays import Array, NumpyArray, ZarrArray
+from .experiments.tasks.evaluators import EvaluationScores
 from .store import (
     create_array_store,
     create_config_store,
     create_stats_store,
     create_weights_store,
 )
+from .store.converter import converter
 
+from funlib.geometry import Coordinate, Roi
+import numpy as np
+import numpy.typing as npt
 import torch
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
 from pathlib import Path
 import logging
+from typing import Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -48,12 +61,57 @@ def validate(
 
 
 def validate_run(
-    run: Run, iteration: int, compute_context: ComputeContext = LocalTorch()
+    run: Run,
+    iteration: int,
+    compute_context: ComputeContext = LocalTorch(),
+    batch_size: int = 1,
+    prediction_dtype: npt.DTypeLike = np.float32,
+    fuse_post_processing: bool = True,
+    num_workers: int = 1,
+    in_memory: bool = False,
+    evaluation_block_size: Optional[Coordinate] = None,
+    update_stores: bool = True,
 ):
     """Validate an already loaded run at the given iteration. This does not
     load the weights of that iteration, it is assumed that the model is already
     loaded correctly. Returns the best parameters and scores for this
-    iteration."""
+    iteration. ``batch_size`` is the number of tiles predicted per forward
+    pass, ``prediction_dtype`` the type in which predictions are stored (see
+    ``predict``).
+
+    If the run's post-processor is block-local and ``fuse_post_processing`` is
+    set, predictions are post-processed blockwise as they are predicted and
+    only the post-processed outputs are written.
+
+    With ``num_workers`` larger than 1, the post-processing and evaluation for
+    the different post-processor parameters are distributed over that many
+    worker processes. The same number of threads is used to copy the
+    validation inputs, which are cached and shared between runs validating on
+    the same data (see ``_copy_cached``).
+
+    With ``in_memory``, post-processed outputs are evaluated in memory, and
+    only outputs that are the new best for a criterion are stored (as best
+    validation arrays).
+
+    If an ``evaluation_block_size`` (in world units) is given, outputs are
+    evaluated blockwise in blocks of that size, to evaluate volumes that do
+    not fit into memory.
+
+    If the run has a ``fast_validation_fraction``, iterations before the last
+    one are first validated in "fast" mode: only on a seeded random subset of
+    blocks of every validation dataset, covering about that fraction of it and
+    the same for every iteration. Only if this improves on the best fast
+    scores of earlier iterations, the iteration is validated in "full" mode
+    on the whole datasets as well. Only full validations are considered for
+    the best iterations and outputs. Scores are stored tagged with their
+    mode.
+
+    Without ``update_stores``, the scores are only added to the run's
+    validation scores. They are neither stored nor used to update the best
+    validation arrays and weights, which is left to
+    ``merge_validation_scores`` (e.g., when validating in a background
+    process). The validation outputs are kept for that."""
+    assert update_stores or not in_memory
     # set benchmark flag to True for performance
     torch.backends.cudnn.benchmark = True
     run.model.eval()
@@ -66,6 +124,49 @@ def validate_run(
         logger.info("Cannot validate run %s. Continuing training!", run.name)
         return None, None
 
+    def validate_mode(mode: str) -> ValidationIterationScores:
+        return _validate_run(
+            run,
+            iteration,
+            mode,
+            compute_context=compute_context,
+            batch_size=batch_size,
+            prediction_dtype=prediction_dtype,
+            fuse_post_processing=fuse_post_processing,
+            num_workers=num_workers,
+            in_memory=in_memory,
+            evaluation_block_size=evaluation_block_size,
+            update_stores=update_stores,
+        )
+
+    if run.fast_validation_fraction is not None and iteration < run.train_until:
+        fast_scores = validate_mode("fast")
+        if not _improves_on_subset(run, fast_scores):
+            logger.info(
+                "Iteration %d does not improve on the validation subset, "
+                "skipping full validation",
+                iteration,
+            )
+            return
+    validate_mode("full")
+
+
+def _validate_run(
+    run: Run,
+    iteration: int,
+    mode: str,
+    compute_context: ComputeContext,
+    batch_size: int,
+    prediction_dtype: npt.DTypeLike,
+    fuse_post_processing: bool,
+    num_workers: int,
+    in_memory: bool,
+    evaluation_block_size: Optional[Coordinate],
+    update_stores: bool,
+) -> ValidationIterationScores:
+    """Validate a run in the given mode ("full" or "fast"), see
+    ``validate_run``. Returns the scores of this iteration."""
+
     # get array and weight store
     weights_store = create_weights_store()
     array_store = create_array_store()
@@ -77,7 +178,10 @@ def validate_run(
 
     # Initialize the evaluator with the best scores seen so far
     evaluator.set_best(run.validation_scores)
+    evaluator.block_size = evaluation_block_size
+    evaluator.metrics = run.validation_metrics
 
+    assert run.datasplit.validate is not None
     for validation_dataset in run.datasplit.validate:
         assert (
             validation_dataset.gt is not None
@@ -113,43 +217,129 @@ def validate_run(
                 .snap_to_grid(validation_dataset.raw.voxel_size, mode="grow")
                 .intersect(validation_dataset.raw.roi)
             )
-            input_raw = ZarrArray.create_from_array_identifier(
-                input_raw_array_identifier,
-                validation_dataset.raw.axes,
+            _copy_cached(
+                array_store,
+                validation_dataset.config.raw_config,
+                validation_dataset.raw,
                 input_roi,
-                validation_dataset.raw.num_channels,
-                validation_dataset.raw.voxel_size,
-                validation_dataset.raw.dtype,
-                name=f"{run.name}_validation_raw",
+                context,
+                input_raw_array_identifier,
                 write_size=input_size,
+                num_workers=num_workers,
             )
-            input_raw[input_roi] = validation_dataset.raw[input_roi]
-            input_gt = ZarrArray.create_from_array_identifier(
-                input_gt_array_identifier,
-                validation_dataset.gt.axes,
+            _copy_cached(
+                array_store,
+                validation_dataset.config.gt_config,
+                validation_dataset.gt,
                 output_roi,
-                validation_dataset.gt.num_channels,
-                validation_dataset.gt.voxel_size,
-                validation_dataset.gt.dtype,
-                name=f"{run.name}_validation_gt",
+                Coordinate((0,) * output_roi.dims),
+                input_gt_array_identifier,
                 write_size=output_size,
+                num_workers=num_workers,
             )
-            input_gt[output_roi] = validation_dataset.gt[output_roi]
         else:
             logger.info("validation inputs already copied!")
 
         prediction_array_identifier = array_store.validation_prediction_array(
             run.name, iteration, validation_dataset
         )
-        predict(
-            run.model,
-            validation_dataset.raw,
-            prediction_array_identifier,
-            compute_context=compute_context,
-            output_roi=validation_dataset.gt.roi,
-        )
-
-        post_processor.set_prediction(prediction_array_identifier)
+        output_array_identifiers = {
+            parameters: array_store.validation_output_array(
+                run.name, iteration, parameters, validation_dataset
+            )
+            for parameters in post_processor.enumerate_parameters()
+        }
+        mask = None
+        evaluator.rois = None
+        if mode == "fast":
+            assert run.fast_validation_fraction is not None
+            output_size = (
+                run.model.scale(validation_dataset.raw.voxel_size)
+                * run.model.compute_output_shape(run.model.eval_input_shape)[1]
+            )
+            evaluator.rois, mask = _validation_subset(
+                validation_dataset.gt,
+                output_size,
+                run.fast_validation_fraction,
+                run.fast_validation_seed,
+            )
+        fused = fuse_post_processing and post_processor.block_local
+        if fused:
+            predict(
+                run.model,
+                validation_dataset.raw,
+                prediction_array_identifier,
+                compute_context=compute_context,
+                output_roi=validation_dataset.gt.roi,
+                batch_size=batch_size,
+                compiled_model_dir=weights_store.compiled_model_dir(
+                    run.name, iteration
+                ),
+                post_processor=post_processor,
+                post_processor_outputs=output_array_identifiers,
+                mask=mask,
+            )
+        else:
+            predict(
+                run.model,
+                validation_dataset.raw,
+                prediction_array_identifier,
+                compute_context=compute_context,
+                output_roi=validation_dataset.gt.roi,
+                batch_size=batch_size,
+                compiled_model_dir=weights_store.compiled_model_dir(
+                    run.name, iteration
+                ),
+                output_dtype=prediction_dtype,
+                mask=mask,
+            )
+            post_processor.set_prediction(prediction_array_identifier)
+
+        # outputs written during prediction are always stored
+        keep_in_memory = in_memory and not fused
+        sweep_outputs = [
+            (parameters, None if keep_in_memory else output_array_identifier)
+            for parameters, output_array_identifier in output_array_identifiers.items()
+        ]
+
+        sweep_results: Iterable[Tuple[EvaluationScores, Optional[Array]]]
+        if num_workers > 1:
+            if not fused:
+                # read the prediction only once, the forked workers share it
+                prediction_array = ZarrArray.open_from_array_identifier(
+                    prediction_array_identifier
+                )
+                post_processor.set_prediction_array(
+                    NumpyArray.from_np_array(
+                        prediction_array[prediction_array.roi],
+                        prediction_array.roi,
+                        prediction_array.voxel_size,
+                        prediction_array.axes,
+                    )
+                )
+                post_processor.prepare()
+            with multiprocessing.get_context("fork").Pool(
+                num_workers,
+                initializer=_init_sweep_worker,
+                initargs=(post_processor, evaluator, validation_dataset.gt, not fused),
+            ) as pool:
+                sweep_results = pool.starmap(_sweep_worker, sweep_outputs)
+            if not fused:
+                # don't keep the prediction in memory
+                post_processor.set_prediction(prediction_array_identifier)
+        else:
+            # evaluated one after the other while iterating over the results,
+            # to keep only a single in-memory output at a time
+            sweep_results = (
+                _post_process_and_evaluate(
+                    post_processor,
+                    evaluator,
+                    validation_dataset.gt,
+                    not fused,
+                    *parameters_and_output,
+                )
+                for parameters_and_output in sweep_outputs
+            )
 
         dataset_iteration_scores = []
 
@@ -162,16 +352,22 @@ def validate_run(
                 run.validation_scores.evaluation_scores.higher_is_better(criterion),
             )
 
-        for parameters in post_processor.enumerate_parameters():
-            output_array_identifier = array_store.validation_output_array(
-                run.name, iteration, parameters, validation_dataset
-            )
-
-            post_processed_array = post_processor.process(
-                parameters, output_array_identifier
+        for (parameters, output_array_identifier), (
+            scores,
+            post_processed_array,
+        ) in zip(output_array_identifiers.items(), sweep_results):
+            dataset_iteration_scores.append(
+                [getattr(scores, criterion) for criterion in scores.criteria]
             )
-
-            scores = evaluator.evaluate(output_array_identifier, validation_dataset.gt)
+            if mode == "fast" or not update_stores:
+                # the best iterations and outputs are only determined by full
+                # validations
+                continue
+
+            if post_processed_array is None and not keep_in_memory:
+                post_processed_array = ZarrArray.open_from_array_identifier(
+                    output_array_identifier
+                )
             for criterion in run.validation_scores.criteria:
                 # replace predictions in array with the new better predictions
                 if evaluator.is_best(
@@ -199,29 +395,20 @@ def validate_run(
                         # For example, if parameter 2 did better this round than it did in other rounds, but it was still worse than parameter 1
                         # the code would have overwritten it below since all parameters write to the same file. Now each parameter will be its own file
                         # Either we do that, or we only write out the overall best, regardless of parameters
-                        best_array_identifier = array_store.best_validation_array(
-                            run.name, criterion, index=validation_dataset.name
-                        )
-                        best_array = ZarrArray.create_from_array_identifier(
-                            best_array_identifier,
-                            post_processed_array.axes,
-                            post_processed_array.roi,
-                            post_processed_array.num_channels,
-                            post_processed_array.voxel_size,
-                            post_processed_array.dtype,
-                        )
-                        best_array[best_array.roi] = post_processed_array[
-                            post_processed_array.roi
-                        ]
-                        best_array.add_metadata(
-                            {
-                                "iteration": iteration,
-                                criterion: getattr(scores, criterion),
-                                "parameters_id": parameters.id,
-                            }
-                        )
-                        weights_store.store_best(
-                            run, iteration, validation_dataset.name, criterion
+                        if post_processed_array is None:
+                            # in-memory outputs of worker processes are not
+                            # sent back, compute this one again
+                            post_processed_array = post_processor.process(
+                                parameters, None
+                            )
+                        _store_best_validation(
+                            run,
+                            iteration,
+                            validation_dataset,
+                            parameters,
+                            criterion,
+                            current_score,
+                            post_processed_array,
                         )
 
             # delete current output. We only keep the best outputs as determined by
@@ -229,15 +416,277 @@ def validate_run(
             # remove deletion for now since we have to rerun later to double check things anyway
             # array_store.remove(output_array_identifier)
 
-            dataset_iteration_scores.append(
-                [getattr(scores, criterion) for criterion in scores.criteria]
-            )
-
         iteration_scores.append(dataset_iteration_scores)
         array_store.remove(prediction_array_identifier)
+        if in_memory and fused:
+            # outputs were written during prediction, the best ones are copied
+            for output_array_identifier in output_array_identifiers.values():
+                array_store.remove(output_array_identifier)
 
-    run.validation_scores.add_iteration_scores(
-        ValidationIterationScores(iteration, iteration_scores)
+    validation_iteration_scores = ValidationIterationScores(
+        iteration, iteration_scores, mode
     )
-    stats_store = create_stats_store()
-    stats_store.store_validation_iteration_scores(run.name, run.validation_scores)
+    run.validation_scores.add_iteration_scores(validation_iteration_scores)
+    if update_stores:
+        stats_store = create_stats_store()
+        stats_store.store_validation_iteration_scores(run.name, run.validation_scores)
+    return validation_iteration_scores
+
+
+def merge_validation_scores(
+    run: Run, iteration_scores: ValidationIterationScores
+) -> None:
+    """Add the scores of an iteration validated without ``update_stores`` (see
+    ``validate_run``) to the run's validation scores. Scores have to be merged
+    in the order of their iterations. Where full validation scores improve on
+    the best scores of earlier iterations, the stored validation output of
+    this iteration becomes the best validation array, and its weights the
+    best weights. The scores are not stored."""
+
+    if iteration_scores.mode == "full":
+        array_store = create_array_store()
+        evaluator = run.task.evaluator
+        validation_scores = run.validation_scores
+        overall_best_scores = validation_scores.overall_best_scores()
+        for dataset, dataset_scores in zip(
+            validation_scores.datasets, iteration_scores.scores
+        ):
+            for i, criterion in enumerate(validation_scores.criteria):
+                if not evaluator.store_best(criterion):
+                    continue
+                higher_is_better = validation_scores.evaluation_scores.higher_is_better(
+                    criterion
+                )
+                best_score = overall_best_scores.get((dataset, criterion))
+                # the parameters and score of this iteration, if they are the
+                # new overall best
+                best = None
+                for parameters, parameter_scores in zip(
+                    validation_scores.parameters, dataset_scores
+                ):
+                    score = parameter_scores[i]
+                    if score is None or math.isnan(score):
+                        continue
+                    if best_score is None or (
+                        score > best_score if higher_is_better else score < best_score
+                    ):
+                        best_score = score
+                        best = (parameters, score)
+                if best is not None:
+                    best_parameters, score = best
+                    _store_best_validation(
+                        run,
+                        iteration_scores.iteration,
+                        dataset,
+                        best_parameters,
+                        criterion,
+                        score,
+                        ZarrArray.open_from_array_identifier(
+                            array_store.validation_output_array(
+                                run.name,
+                                iteration_scores.iteration,
+                                best_parameters,
+                                dataset,
+                            )
+                        ),
+                    )
+
+    run.validation_scores.add_iteration_scores(iteration_scores)
+
+
+def _store_best_validation(
+    run: Run,
+    iteration: int,
+    dataset,
+    parameters,
+    criterion: str,
+    score: float,
+    post_processed_array: Array,
+) -> None:
+    """Store a post-processed validation output as the best validation array
+    for a dataset and criterion, and the weights of its iteration as the best
+    weights."""
+
+    best_array_identifier = create_array_store().best_validation_array(
+        run.name, criterion, index=dataset.name
+    )
+    best_array = ZarrArray.create_from_array_identifier(
+        best_array_identifier,
+        post_processed_array.axes,
+        post_processed_array.roi,
+        post_processed_array.num_channels,
+        post_processed_array.voxel_size,
+        post_processed_array.dtype,
+    )
+    best_array[best_array.roi] = post_processed_array[post_processed_array.roi]
+    best_array.add_metadata(
+        {
+            "iteration": iteration,
+            criterion: score,
+            "parameters_id": parameters.id,
+        }
+    )
+    create_weights_store().store_best(run, iteration, dataset.name, criterion)
+
+
+def _validation_subset(
+    array: Array, block_size: Coordinate, fraction: float, seed: int
+) -> Tuple[List[Roi], NumpyArray]:
+    """Select a seeded random subset of the blocks of ``block_size`` tiling
+    the ROI of ``array`` (starting at its offset, as the blocks of
+    ``predict``), covering about ``fraction`` of it. Returns the selected
+    blocks (cropped to the ROI) and a mask that is non-zero only in them."""
+
+    roi = array.roi
+    num_blocks = [-(-s // b) for s, b in zip(roi.shape, block_size)]
+    all_blocks = [
+        Roi(roi.offset + Coordinate(index) * block_size, block_size).intersect(roi)
+        for index in itertools.product(*(range(n) for n in num_blocks))
+    ]
+    num_selected = min(len(all_blocks), max(1, round(fraction * len(all_blocks))))
+    selected = np.random.default_rng(seed).choice(
+        len(all_blocks), num_selected, replace=False
+    )
+    rois = [all_blocks[index] for index in sorted(selected)]
+
+    # the mask only needs to resolve the grid of blocks
+    mask_voxel_size = Coordinate(math.gcd(o, b) for o, b in zip(roi.offset, block_size))
+    mask_roi = roi.snap_to_grid(mask_voxel_size, mode="grow")
+    mask = NumpyArray.from_np_array(
+        np.zeros(mask_roi.shape / mask_voxel_size, dtype=np.uint8),
+        mask_roi,
+        mask_voxel_size,
+        [axis for axis in array.axes if axis != "c"],
+    )
+    for block in rois:
+        mask[block.snap_to_grid(mask_voxel_size, mode="grow")] = 1
+    return rois, mask
+
+
+def _improves_on_subset(run: Run, iteration_scores: ValidationIterationScores) -> bool:
+    """Check whether the (already added) fast ``iteration_scores`` improve on
+    the best fast scores of earlier iterations, for any dataset,
+    post-processing parameters and criterion for which the best is stored."""
+
+    best_scores = run.validation_scores.best_scores(mode="fast")
+    return any(
+        best_iteration == iteration_scores.iteration
+        for (_, _, criterion), (best_iteration, _) in best_scores.items()
+        if run.task.evaluator.store_best(criterion)
+    )
+
+
+def _post_process_and_evaluate(
+    post_processor,
+    evaluator,
+    evaluation_array,
+    post_process,
+    parameters,
+    output_array_identifier,
+):
+    """Post-process (unless already done) and evaluate the output for the
+    given parameters. Returns the scores and, if no
+    ``output_array_identifier`` is given, the in-memory output."""
+
+    if not post_process:
+        return evaluator.evaluate(output_array_identifier, evaluation_array), None
+    post_processed_array = post_processor.process(parameters, output_array_identifier)
+    if output_array_identifier is None:
+        return (
+            evaluator.evaluate(post_processed_array, evaluation_array),
+            post_processed_array,
+        )
+    return evaluator.evaluate(output_array_identifier, evaluation_array), None
+
+
+# state of a worker process of a parameter sweep, inherited from the parent
+_sweep_state = None
+
+
+def _init_sweep_worker(post_processor, evaluator, evaluation_array, post_process):
+    global _sweep_state
+    _sweep_state = (post_processor, evaluator, evaluation_array, post_process)
+
+
+def _sweep_worker(parameters, output_array_identifier):
+    scores, _ = _post_process_and_evaluate(
+        *_sweep_state, parameters, output_array_identifier
+    )
+    return scores, None
+
+
+def _copy_cached(
+    array_store,
+    array_config,
+    array,
+    roi: Roi,
+    context: Coordinate,
+    array_identifier,
+    write_size: Coordinate,
+    num_workers: int = 1,
+):
+    """Copy ``roi`` of ``array`` to ``array_identifier``. The copy is shared
+    between runs: it is stored once in a cache keyed by a hash of the array's
+    config, the ROI and the context, and linked to ``array_identifier``."""
+
+    key = hashlib.sha256(
+        json.dumps(
+            [converter.unstructure(array_config), roi.offset, roi.shape, context],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+    cache_identifier = array_store.validation_input_cache(key)
+    cache_path = Path(cache_identifier.container, cache_identifier.dataset)
+
+    if not cache_path.exists():
+        logger.info("Caching %s in %s", array, cache_path)
+        # copy to a temporary dataset first, so that a partial copy never
+        # shows up in the cache
+        tmp_identifier = array_store.validation_input_cache(f"{key}_{os.getpid()}")
+        tmp_array = ZarrArray.create_from_array_identifier(
+            tmp_identifier,
+            array.axes,
+            roi,
+            array.num_channels,
+            array.voxel_size,
+            array.dtype,
+            write_size=write_size,
+        )
+        _copy_blockwise(array, tmp_array, roi, num_workers)
+        try:
+            os.rename(
+                Path(tmp_identifier.container, tmp_identifier.dataset), cache_path
+            )
+        except OSError:
+            # another process cached the same array in the meantime
+            array_store.remove(tmp_identifier)
+    else:
+        logger.info("Using cached copy of %s in %s", array, cache_path)
+
+    array_store.link(cache_identifier, array_identifier)
+
+
+def _copy_blockwise(source, target: ZarrArray, roi: Roi, num_workers: int = 1):
+    """Copy ``roi`` from ``source`` to ``target`` one chunk of ``target`` at a
+    time, using ``num_workers`` threads. Only as many blocks as there are
+    workers are held in memory at once."""
+
+    voxel_size = target.voxel_size
+    chunk_size = Coordinate(target.data.chunks[-voxel_size.dims :]) * voxel_size
+    offset = target.roi.offset
+    blocks = [
+        Roi(offset + chunk_size * Coordinate(index), chunk_size).intersect(roi)
+        for index in itertools.product(
+            *(range(-(-s // c)) for s, c in zip(target.roi.shape, chunk_size))
+        )
+    ]
+
+    def copy(block: Roi):
+        if not block.empty:
+            target[block] = source[block]
+
+    with ThreadPoolExecutor(max(1, num_workers)) as executor:
+        # consume the results to raise any exception
+        for _ in executor.map(copy, blocks):
+            pass
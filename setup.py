@@ -27,7 +27,6 @@ setup(
         "fibsem_tools",
         "attrs",
         "bokeh",
-        "numpy-indexed>=0.3.7",
         "daisy>=1.0",
         "funlib.math>=0.1",
         "funlib.geometry>=0.2",
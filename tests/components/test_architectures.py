@@ -0,0 +1,93 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "kwargs, input_shapes",
+    [
+        # 3D, isotropic
+        (
+            dict(downsample_factors=[(2, 2, 2)]),
+            [(20, 20, 20), (28, 36, 44)],
+        ),
+        # 3D, anisotropic kernels and downsampling, two levels
+        (
+            dict(
+                downsample_factors=[(1, 2, 2), (2, 3, 3)],
+                kernel_size_down=[
+                    [(1, 3, 3), (1, 3, 3)],
+                    [(3, 3, 3), (3, 3, 3)],
+                    [(1, 3, 3), (3, 3, 3)],
+                ],
+                kernel_size_up=[
+                    [(1, 3, 3), (1, 3, 3)],
+                    [(3, 3, 3), (1, 3, 3)],
+                ],
+            ),
+            [(20, 60, 60), (24, 84, 102)],
+        ),
+        # upsampling, by copying and transposed convolutions
+        (
+            dict(downsample_factors=[(2, 2, 2)], upsample_factors=[(2, 2, 2)]),
+            [(20, 20, 20), (28, 36, 44)],
+        ),
+        (
+            dict(
+                downsample_factors=[(2, 2, 2)],
+                upsample_factors=[(1, 2, 2), (2, 1, 1)],
+                constant_upsample=False,
+            ),
+            [(28, 28, 28), (36, 44, 52)],
+        ),
+        # 2D
+        (
+            dict(downsample_factors=[(2, 2), (3, 3)]),
+            [(60, 60), (72, 102)],
+        ),
+        (
+            dict(downsample_factors=[(2, 2)], upsample_factors=[(3, 3)]),
+            [(20, 20), (36, 28)],
+        ),
+        # same padding
+        (
+            dict(downsample_factors=[(2, 2, 2)], padding="same"),
+            [(8, 8, 8), (12, 16, 20)],
+        ),
+    ],
+)
+def test_cnnectome_unet_output_shape(kwargs, input_shapes):
+    from dacapo.experiments.architectures import CNNectomeUNetConfig
+    from dacapo.experiments.model import Model
+
+    from funlib.geometry import Coordinate
+    import torch
+
+    architecture_config = CNNectomeUNetConfig(
+        name="unet",
+        input_shape=Coordinate(input_shapes[0]),
+        fmaps_out=2,
+        fmaps_in=1,
+        num_fmaps=2,
+        fmap_inc_factor=2,
+        **kwargs,
+    )
+    architecture = architecture_config.architecture_type(architecture_config)
+    head = {2: torch.nn.Conv2d, 3: torch.nn.Conv3d}[len(input_shapes[0])](
+        2, 3, kernel_size=3
+    )
+    model = Model(architecture, head)
+    model.eval()
+
+    for input_shape in input_shapes:
+        input_shape = Coordinate(input_shape)
+        with torch.no_grad():
+            x = torch.zeros((1, 1) + input_shape)
+            architecture_output = architecture(x)
+            model_output = model(x)
+
+        assert architecture.compute_output_shape(input_shape) == Coordinate(
+            architecture_output.shape[2:]
+        )
+        assert model.compute_output_shape(input_shape) == (
+            model_output.shape[1],
+            Coordinate(model_output.shape[2:]),
+        )
@@ -44,3 +44,49 @@ def test_array_api(options, array_config):
         array.data[0] = data_slice + 1
         assert data_slice.sum() == 0
         assert (array.data[0] - data_slice).sum() == data_slice.size
+
+
+def test_zarr_array_value_range(tmp_path):
+    from dacapo.experiments.datasplits.datasets.arrays import ZarrArray
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+
+    roi = Roi((0, 0, 0), (10, 10, 10))
+    array = ZarrArray.create_from_array_identifier(
+        LocalArrayIdentifier(tmp_path / "test.zarr", "prediction"),
+        ["c", "z", "y", "x"],
+        roi,
+        2,
+        Coordinate(1, 1, 1),
+        np.uint8,
+        value_range=(-1.0, 1.0),
+    )
+    data = np.linspace(-1, 1, 2000, dtype=np.float32).reshape((2, 10, 10, 10))
+    array[roi] = data
+
+    assert array.data.dtype == np.uint8
+    assert array.dtype == np.float32
+    assert np.abs(array[roi] - data).max() <= 1 / 255
+
+
+def test_zarr_array_keep_existing(tmp_path):
+    from dacapo.experiments.datasplits.datasets.arrays import ZarrArray
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+
+    identifier = LocalArrayIdentifier(tmp_path / "test.zarr", "prediction")
+    roi = Roi((0, 0, 0), (10, 10, 10))
+    args = (identifier, ["c", "z", "y", "x"], roi, 1, Coordinate(1, 1, 1), np.float32)
+
+    array = ZarrArray.create_from_array_identifier(*args)
+    array[roi] = np.ones((1, 10, 10, 10), dtype=np.float32)
+
+    array = ZarrArray.create_from_array_identifier(*args, overwrite=False)
+    assert (array[roi] == 1).all()
+
+    array = ZarrArray.create_from_array_identifier(*args)
+    assert (array[roi] == 0).all()
@@ -0,0 +1,213 @@
+import pytest
+
+
+def binary_arrays():
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+
+    voxel_size = Coordinate(2, 1, 1)
+    roi = Roi((0, 0, 0), (24, 20, 20))
+
+    # small objects in opposite corners, that overlap a little, such that most
+    # distances are much larger than the halo of the blocks
+    truth = np.zeros((12, 20, 20), dtype=np.uint8)
+    truth[0:3, 0:4, 0:4] = 1
+    truth[5, 9, 3] = 1
+    test = np.zeros((12, 20, 20), dtype=np.uint8)
+    test[8:12, 14:20, 15:20] = 1
+    test[1:3, 2:5, 2:5] = 1
+
+    return (
+        NumpyArray.from_np_array(truth, roi, voxel_size, ["z", "y", "x"]),
+        NumpyArray.from_np_array(test, roi, voxel_size, ["z", "y", "x"]),
+    )
+
+
+@pytest.mark.parametrize(
+    "metrics",
+    [
+        # exact distances, the halo has to grow
+        None,
+        # distances bounded by the tolerance
+        ["false_positive_rate_with_tolerance", "precision_with_tolerance"],
+    ],
+)
+def test_binary_segmentation_evaluator_blockwise(metrics):
+    from dacapo.experiments.tasks.evaluators import BinarySegmentationEvaluator
+
+    from funlib.geometry import Coordinate
+    import numpy as np
+
+    truth, test = binary_arrays()
+    evaluator = BinarySegmentationEvaluator(
+        clip_distance=3, tol_distance=2, channels=["a"]
+    )
+    evaluator.metrics = metrics
+
+    expected = evaluator.evaluate(test, truth)
+    evaluator.block_size = Coordinate(8, 5, 5)
+    scores = evaluator.evaluate(test, truth)
+
+    criteria = type(scores).criteria
+    assert any(not np.isnan(getattr(expected, c)) for c in criteria)
+    np.testing.assert_allclose(
+        [getattr(scores, c) for c in criteria],
+        [getattr(expected, c) for c in criteria],
+        rtol=1e-10,
+        equal_nan=True,
+    )
+
+
+def test_instance_evaluator_blockwise():
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray
+    from dacapo.experiments.tasks.evaluators import InstanceEvaluator
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+
+    voxel_size = Coordinate(2, 1, 1)
+    roi = Roi((0, 0, 0), (24, 20, 20))
+    z, y, x = np.meshgrid(np.arange(12), np.arange(20), np.arange(20), indexing="ij")
+    # objects spanning several blocks, the test labels split and merge some
+    # of them
+    truth = ((z // 5) * 10 + (y // 7) + 1).astype(np.uint64)
+    truth[:, :, :3] = 0
+    test = ((z // 4) * 10 + (y + x) // 9 + 1).astype(np.uint64)
+    test[5:7] = 0
+
+    truth_array = NumpyArray.from_np_array(truth, roi, voxel_size, ["z", "y", "x"])
+    test_array = NumpyArray.from_np_array(test, roi, voxel_size, ["z", "y", "x"])
+
+    evaluator = InstanceEvaluator()
+    expected = evaluator.evaluate(test_array, truth_array)
+    evaluator.block_size = Coordinate(6, 4, 7)
+    scores = evaluator.evaluate(test_array, truth_array)
+
+    assert expected.voi_split > 0 and expected.voi_merge > 0
+    assert scores.voi_split == pytest.approx(expected.voi_split)
+    assert scores.voi_merge == pytest.approx(expected.voi_merge)
+
+
+@pytest.mark.parametrize("max_distance", [None, 6])
+def test_array_evaluator_anisotropic(max_distance):
+    from dacapo.experiments.tasks.evaluators.binary_segmentation_evaluator import (
+        ArrayEvaluator,
+    )
+
+    from funlib.geometry import Coordinate
+    import numpy as np
+
+    voxel_size = Coordinate(4, 1, 2)
+    rng = np.random.default_rng(1)
+    truth = (rng.random((6, 9, 8)) > 0.95).astype(np.uint8)
+    test = (rng.random((6, 9, 8)) > 0.9).astype(np.uint8)
+
+    evaluator = ArrayEvaluator(
+        truth,
+        test,
+        metric_params={"clip_distance": 5, "tol_distance": 3},
+        resolution=voxel_size,
+        max_distance=max_distance,
+    )
+
+    # distances of all foreground voxels of one segmentation to the closest
+    # foreground voxel of the other, in world units
+    def distances(a, b):
+        a = np.argwhere(a) * np.array(voxel_size)
+        b = np.argwhere(b) * np.array(voxel_size)
+        return np.sqrt(((a[:, None] - b[None]) ** 2).sum(axis=-1)).min(axis=1)
+
+    false_positive_distances = distances(test, truth)
+    false_negative_distances = distances(truth, test)
+    assert false_positive_distances.max() > 6
+
+    expected = {
+        "mean_false_distance_clipped": 0.5
+        * (
+            np.clip(false_positive_distances, None, 5).mean()
+            + np.clip(false_negative_distances, None, 5).mean()
+        ),
+        "false_positive_rate_with_tolerance": (false_positive_distances > 3).sum()
+        / (truth == 0).sum(),
+        "false_negative_rate_with_tolerance": (false_negative_distances > 3).mean(),
+    }
+    if max_distance is None:
+        expected["hausdorff"] = max(
+            false_positive_distances.max(), false_negative_distances.max()
+        )
+        expected["mean_false_distance"] = 0.5 * (
+            false_positive_distances.mean() + false_negative_distances.mean()
+        )
+
+    for metric, value in expected.items():
+        assert getattr(evaluator, metric)() == pytest.approx(value, rel=1e-6), metric
+
+
+def test_evaluator_best_scores():
+    from dacapo.experiments import ValidationIterationScores, ValidationScores
+    from dacapo.experiments.tasks.evaluators import (
+        BinarySegmentationEvaluationScores,
+        BinarySegmentationEvaluator,
+    )
+    from dacapo.experiments.tasks.post_processors import (
+        ThresholdPostProcessorParameters,
+    )
+
+    import math
+    import numpy as np
+
+    parameters = [ThresholdPostProcessorParameters(id=i) for i in range(3)]
+    datasets = ["a", "b"]
+    evaluation_scores = BinarySegmentationEvaluationScores()
+    criteria = evaluation_scores.criteria
+    validation_scores = ValidationScores(parameters, datasets, evaluation_scores)
+    evaluator = BinarySegmentationEvaluator(
+        clip_distance=40, tol_distance=40, channels=["x"]
+    )
+    evaluator.set_best(validation_scores)
+
+    # coarse scores, to have ties between iterations, with some missing
+    rng = np.random.default_rng(0)
+    for iteration in range(1, 7):
+        scores = rng.integers(0, 4, (len(datasets), len(parameters), len(criteria)))
+        scores = scores.astype(np.float64) / 4
+        scores[rng.random(scores.shape) < 0.2] = np.nan
+        mode = "fast" if iteration % 3 == 0 else "full"
+        validation_scores.add_iteration_scores(
+            ValidationIterationScores(iteration * 10, scores.tolist(), mode)
+        )
+
+        # the best scores computed from the scores as an xarray
+        scores_array = validation_scores.to_xarray()
+        best_iterations, best_scores = validation_scores.get_best(
+            scores_array, dim="iterations"
+        )
+        for dataset in datasets:
+            for criterion in criteria:
+                higher_is_better = evaluation_scores.higher_is_better(criterion)
+                for parameter in parameters:
+                    best_score = best_scores.sel(
+                        datasets=dataset, parameters=parameter, criteria=criterion
+                    ).item()
+                    best = evaluator.best_scores.get((dataset, parameter, criterion))
+                    if math.isnan(best_score):
+                        assert best is None
+                    else:
+                        best_iteration = best_iterations.sel(
+                            datasets=dataset, parameters=parameter, criteria=criterion
+                        ).item()
+                        assert best == (best_iteration, best_score)
+
+                overall_scores = scores_array.sel(datasets=dataset, criteria=criterion)
+                overall_best = (
+                    overall_scores.max(skipna=True)
+                    if higher_is_better
+                    else overall_scores.min(skipna=True)
+                ).item()
+                score = evaluator.get_overall_best(dataset, criterion, higher_is_better)
+                if math.isnan(overall_best):
+                    assert score is None
+                else:
+                    assert score == overall_best
@@ -0,0 +1,157 @@
+import pytest
+
+
+def same_partition(a, b):
+    import numpy as np
+
+    # a and b are the same up to relabelling, with the same background
+    if not np.array_equal(a == 0, b == 0):
+        return False
+    pairs = np.unique(np.stack([a.ravel(), b.ravel()]), axis=1)
+    return pairs.shape[1] == len(np.unique(a)) == len(np.unique(b))
+
+
+def affinities_and_labels():
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+
+    offsets = [
+        Coordinate(1, 0, 0),
+        Coordinate(0, 1, 0),
+        Coordinate(0, 0, 1),
+        Coordinate(0, 3, 0),
+    ]
+    voxel_size = Coordinate(2, 1, 1)
+    roi = Roi((4, -2, 0), (24, 20, 20))
+
+    # slabs that span several blocks, separated by an unlabelled gap, and a
+    # tube through all blocks along x
+    z, y, x = np.meshgrid(np.arange(12), np.arange(20), np.arange(20), indexing="ij")
+    labels = ((z // 6) * 10 + (y // 9) + (x > 9) * 1000 + 1).astype(np.uint64)
+    labels[:, :, 9] = 0
+    labels[(z - 5) ** 2 + (y - 9) ** 2 <= 4] = 100
+
+    affs = np.zeros((len(offsets),) + labels.shape, dtype=np.float32)
+    for c, offset in enumerate(offsets):
+        shape = Coordinate(labels.shape) - offset
+        here = labels[tuple(slice(0, s) for s in shape)]
+        there = labels[tuple(slice(o, o + s) for o, s in zip(offset, shape))]
+        affs[(c,) + tuple(slice(0, s) for s in shape)] = np.logical_and(
+            here == there, here != 0
+        )
+    prediction = NumpyArray.from_np_array(affs, roi, voxel_size, ["c", "z", "y", "x"])
+    return offsets, prediction, labels
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_watershed_post_processor_blockwise(tmp_path, num_workers):
+    from dacapo.experiments.tasks.post_processors import (
+        WatershedPostProcessor,
+        WatershedPostProcessorParameters,
+    )
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate
+
+    offsets, prediction, labels = affinities_and_labels()
+    roi = prediction.roi
+    parameters = WatershedPostProcessorParameters(id=0, bias=0.5)
+
+    post_processor = WatershedPostProcessor(offsets)
+    post_processor.set_prediction_array(prediction)
+    expected = post_processor.process(
+        parameters, LocalArrayIdentifier(tmp_path / "test.zarr", "whole")
+    )[roi]
+    assert same_partition(expected, labels)
+
+    post_processor = WatershedPostProcessor(
+        offsets, block_shape=Coordinate(5, 7, 6), num_workers=num_workers
+    )
+    post_processor.set_prediction_array(prediction)
+    segmentation = post_processor.process(
+        parameters, LocalArrayIdentifier(tmp_path / "test.zarr", "blockwise")
+    )[roi]
+    assert same_partition(segmentation, expected)
+
+
+def test_watershed_post_processor_cache():
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray
+    from dacapo.experiments.tasks.post_processors import WatershedPostProcessor
+
+    import numpy as np
+
+    offsets, prediction, _ = affinities_and_labels()
+    roi = prediction.roi
+
+    # noisy affinities, such that the bias matters, followed by another
+    # channel that is not an affinity
+    rng = np.random.default_rng(0)
+    affs = prediction[roi]
+    affs = np.clip(affs + rng.normal(0, 0.3, affs.shape), 0, 1).astype(np.float32)
+    data = np.concatenate([affs, rng.random((1,) + affs.shape[1:])]).astype(np.float32)
+    prediction = NumpyArray.from_np_array(
+        data, roi, prediction.voxel_size, prediction.axes
+    )
+
+    # the affinities are read once and reused for all biases
+    post_processor = WatershedPostProcessor(offsets)
+    post_processor.set_prediction_array(prediction)
+    post_processor.prepare()
+    cache = post_processor._affinities_cache
+    assert cache is not None
+
+    segmentations = []
+    for parameters in post_processor.enumerate_parameters():
+        segmentations.append(post_processor.process(parameters, None)[roi])
+        assert post_processor._affinities_cache is cache
+    assert len(set(len(np.unique(s)) for s in segmentations)) > 1
+
+    # the same as reading the affinities for every bias, which is done if they
+    # are larger than the cache
+    uncached = WatershedPostProcessor(offsets, max_cache_size=affs.nbytes)
+    uncached.set_prediction_array(prediction)
+    for parameters, segmentation in zip(uncached.enumerate_parameters(), segmentations):
+        np.testing.assert_array_equal(
+            uncached.process(parameters, None)[roi], segmentation
+        )
+        assert uncached._affinities_cache is None
+
+    # a new prediction is read again
+    post_processor.set_prediction_array(prediction)
+    assert post_processor._affinities_cache is None
+
+
+def test_threshold_post_processor_in_memory(tmp_path):
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray, ZarrArray
+    from dacapo.experiments.tasks.post_processors import ThresholdPostProcessor
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+
+    roi = Roi((0, 4, 8), (10, 12, 14))
+    voxel_size = Coordinate(1, 2, 2)
+    data = np.random.randn(2, 10, 6, 7).astype(np.float32)
+    prediction = NumpyArray.from_np_array(data, roi, voxel_size, ["c", "z", "y", "x"])
+
+    post_processor = ThresholdPostProcessor()
+    post_processor.set_prediction_array(prediction)
+    parameters = next(iter(post_processor.enumerate_parameters()))
+
+    # without an identifier, the output is returned in memory
+    output = post_processor.process(parameters, None)
+    assert isinstance(output, NumpyArray)
+    assert output.roi == roi
+    assert output.voxel_size == voxel_size
+    assert output.axes == prediction.axes
+    assert output.dtype == np.uint8
+    np.testing.assert_array_equal(output[roi], data > 0)
+
+    # and is the same as the stored output
+    stored = post_processor.process(
+        parameters, LocalArrayIdentifier(tmp_path / "test.zarr", "threshold")
+    )
+    assert isinstance(stored, ZarrArray)
+    np.testing.assert_array_equal(stored[roi], output[roi])
@@ -0,0 +1,489 @@
+import pytest
+
+
+def test_batched_tiles():
+    from dacapo.predict import BatchedTiles
+
+    from funlib.geometry import Coordinate
+    import torch
+
+    torch.manual_seed(0)
+    model = torch.nn.Conv3d(2, 3, kernel_size=(3, 5, 1))
+    model.eval()
+    input_shape = Coordinate(6, 9, 4)
+    output_shape = Coordinate(4, 5, 4)
+    num_tiles = Coordinate(2, 3, 2)
+
+    x = torch.rand(
+        (1, 2) + tuple(num_tiles * output_shape + input_shape - output_shape)
+    )
+    with torch.no_grad():
+        batched = BatchedTiles(model, input_shape, output_shape)(x)
+
+        # predict every tile on its own
+        expected = torch.zeros((1, 3) + tuple(num_tiles * output_shape))
+        for z in range(num_tiles[0]):
+            for y in range(num_tiles[1]):
+                for x_ in range(num_tiles[2]):
+                    begin = Coordinate(z, y, x_) * output_shape
+                    tile = x[
+                        (slice(None), slice(None))
+                        + tuple(slice(b, b + s) for b, s in zip(begin, input_shape))
+                    ]
+                    expected[
+                        (slice(None), slice(None))
+                        + tuple(slice(b, b + s) for b, s in zip(begin, output_shape))
+                    ] = model(tile)
+
+    assert batched.shape == expected.shape
+    assert torch.allclose(batched, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "tile_shape, chunk_shape, max_tiles",
+    [
+        ((4, 6), (4, 6), 1),
+        ((4, 6), (2, 3), 4),
+        ((4, 6), (6, 4), 1),
+        ((4, 6), (8, 9), 5),
+    ],
+)
+def test_block_plan(tile_shape, chunk_shape, max_tiles):
+    from dacapo.predict import BlockPlan
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+
+    voxel_size = Coordinate(2, 1)
+    output_roi = Roi((4, -3), (58, 41))
+    tile_size = Coordinate(tile_shape) * voxel_size
+    chunk_size = Coordinate(chunk_shape) * voxel_size
+    context = Coordinate(6, 2)
+
+    plan = BlockPlan(output_roi, tile_size, context, chunk_size, voxel_size, max_tiles)
+
+    covered = np.zeros(output_roi.shape / voxel_size, dtype=int)
+    outside = 0
+    for read_roi, write_roi in plan.blocks:
+        assert read_roi == write_roi.grow(context, context)
+        # blocks consist of whole tiles and start at a chunk
+        assert write_roi.shape % tile_size == Coordinate(0, 0)
+        assert (write_roi.begin - output_roi.begin) % chunk_size == Coordinate(0, 0)
+        # blocks only end inside of a chunk at the end of the output ROI
+        for e, b, o, c in zip(
+            write_roi.end, output_roi.begin, output_roi.end, chunk_size
+        ):
+            assert (e - b) % c == 0 or e >= o
+        # no block extends by a whole tile beyond the output ROI
+        assert all(
+            e - t < o for e, t, o in zip(write_roi.end, tile_size, output_roi.end)
+        )
+        valid_roi = write_roi.intersect(output_roi)
+        outside += np.prod(write_roi.shape / voxel_size) - np.prod(
+            valid_roi.shape / voxel_size
+        )
+        begin = (valid_roi.begin - output_roi.begin) / voxel_size
+        end = (valid_roi.end - output_roi.begin) / voxel_size
+        covered[tuple(slice(b, e) for b, e in zip(begin, end))] += 1
+
+    # every voxel of the output ROI is written by exactly one block
+    assert (covered == 1).all()
+    assert plan.wasted_voxels == outside
+    assert plan.partial_chunk_writes == 0
+
+
+@pytest.mark.parametrize("failing_stage", ["read", "predict", "write"])
+def test_predict_streaming_error(failing_stage):
+    from dacapo.predict import _predict_streaming
+
+    from funlib.geometry import Roi
+    import numpy as np
+
+    import threading
+
+    blocks = [(Roi((i,), (3,)), Roi((i + 1,), (1,))) for i in range(20)]
+    written = []
+
+    def stage(name, result):
+        # fail on the sixth block
+        failing_roi = blocks[5][0] if name == "read" else blocks[5][1]
+
+        def run(*args):
+            if name == failing_stage and args[0] == failing_roi:
+                raise RuntimeError(f"{name} failed")
+            return result(*args)
+
+        return run
+
+    read_block = stage("read", lambda read_roi: np.zeros((1, 3)))
+    predict_block = stage("predict", lambda write_roi, data: data[:, 1:2])
+    write_block = stage("write", lambda write_roi, data: written.append(write_roi))
+
+    errors = []
+
+    def predict():
+        try:
+            _predict_streaming(blocks, read_block, predict_block, write_block, 2)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=predict, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+
+    assert not thread.is_alive(), "prediction did not stop after an error"
+    assert len(errors) == 1 and str(errors[0]) == f"{failing_stage} failed"
+    # blocks are written in order, up to (at most) the failing one, blocks
+    # still in the queues are dropped
+    assert len(written) <= 5
+    assert written == [write_roi for _, write_roi in blocks[: len(written)]]
+
+
+def test_predict_resume(tmp_path):
+    from dacapo.compute_context import LocalTorch
+    from dacapo.experiments.architectures import DummyArchitectureConfig
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray, ZarrArray
+    from dacapo.experiments.model import Model
+    from dacapo.predict import BlockIndex, predict
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+    import torch
+    import zarr
+
+    architecture_config = DummyArchitectureConfig(
+        name="dummy_architecture", num_in_channels=1, num_out_channels=2
+    )
+    model = Model(
+        architecture_config.architecture_type(architecture_config),
+        torch.nn.Identity(),
+    )
+    raw = NumpyArray.from_np_array(
+        np.random.rand(78, 38, 38).astype(np.float32),
+        Roi((0, 0, 0), (78, 38, 38)),
+        Coordinate(1, 1, 1),
+        ["z", "y", "x"],
+    )
+    output_roi = Roi((1, 1, 1), (76, 36, 36))
+    identifier = LocalArrayIdentifier(tmp_path / "test.zarr", "prediction")
+    args = (model, raw, identifier)
+    kwargs = dict(compute_context=LocalTorch(device="cpu"), output_roi=output_roi)
+
+    predict(*args, **kwargs)
+    expected = ZarrArray.open_from_array_identifier(identifier)[output_roi]
+
+    # forget about one of the blocks and overwrite all of the prediction
+    markers = sorted(BlockIndex(identifier).path.iterdir())
+    assert len(markers) > 1
+    values = [int(value) for value in markers[0].name.split("_")]
+    redone = Roi(values[:3], values[3:])
+    markers[0].unlink()
+    zarr.open(str(identifier.container))[identifier.dataset][:] = -1
+
+    predict(*args, resume=True, **kwargs)
+    prediction = ZarrArray.open_from_array_identifier(identifier)
+
+    # only the forgotten block is predicted again
+    redone = redone.intersect(output_roi)
+    redone_slices = (slice(None),) + tuple(
+        slice(b - o, e - o)
+        for b, e, o in zip(redone.begin, redone.end, output_roi.begin)
+    )
+    prediction = prediction[output_roi]
+    assert (prediction[redone_slices] == expected[redone_slices]).all()
+    prediction[redone_slices] = -1
+    assert (prediction == -1).all()
+
+
+def test_predict_workers(tmp_path):
+    from dacapo.compute_context import LocalTorch
+    from dacapo.experiments.architectures import DummyArchitectureConfig
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray, ZarrArray
+    from dacapo.experiments.model import Model
+    from dacapo.predict import predict
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+    import torch
+
+    architecture_config = DummyArchitectureConfig(
+        name="dummy_architecture", num_in_channels=1, num_out_channels=2
+    )
+    model = Model(
+        architecture_config.architecture_type(architecture_config),
+        torch.nn.Identity(),
+    )
+    raw = NumpyArray.from_np_array(
+        np.random.rand(78, 38, 38).astype(np.float32),
+        Roi((0, 0, 0), (78, 38, 38)),
+        Coordinate(1, 1, 1),
+        ["z", "y", "x"],
+    )
+    output_roi = Roi((1, 1, 1), (76, 36, 36))
+
+    predictions = []
+    for num_cpu_workers in [1, 2]:
+        identifier = LocalArrayIdentifier(
+            tmp_path / "test.zarr", f"prediction_{num_cpu_workers}"
+        )
+        predict(
+            model,
+            raw,
+            identifier,
+            num_cpu_workers=num_cpu_workers,
+            compute_context=LocalTorch(device="cpu"),
+            output_roi=output_roi,
+        )
+        predictions.append(ZarrArray.open_from_array_identifier(identifier)[output_roi])
+
+    assert not (predictions[0] == 0).all()
+    np.testing.assert_array_equal(predictions[1], predictions[0])
+
+
+def test_predict_resume_post_processed(tmp_path):
+    from dacapo.compute_context import LocalTorch
+    from dacapo.experiments.architectures import DummyArchitectureConfig
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray, ZarrArray
+    from dacapo.experiments.model import Model
+    from dacapo.experiments.tasks.post_processors import (
+        ThresholdPostProcessor,
+        ThresholdPostProcessorParameters,
+    )
+    from dacapo.predict import predict
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+    import torch
+
+    from pathlib import Path
+
+    architecture_config = DummyArchitectureConfig(
+        name="dummy_architecture", num_in_channels=1, num_out_channels=2
+    )
+    model = Model(
+        architecture_config.architecture_type(architecture_config),
+        torch.nn.Identity(),
+    )
+    raw = NumpyArray.from_np_array(
+        np.random.rand(78, 38, 38).astype(np.float32),
+        Roi((0, 0, 0), (78, 38, 38)),
+        Coordinate(1, 1, 1),
+        ["z", "y", "x"],
+    )
+    output_roi = Roi((1, 1, 1), (76, 36, 36))
+    prediction_identifier = LocalArrayIdentifier(tmp_path / "test.zarr", "prediction")
+    parameters = ThresholdPostProcessorParameters(id=1)
+
+    outputs = []
+    for output, resume in [("a", False), ("b", True)]:
+        output_identifier = LocalArrayIdentifier(tmp_path / "test.zarr", output)
+        predict(
+            model,
+            raw,
+            prediction_identifier,
+            compute_context=LocalTorch(device="cpu"),
+            output_roi=output_roi,
+            resume=resume,
+            post_processor=ThresholdPostProcessor(),
+            post_processor_outputs={parameters: output_identifier},
+        )
+
+        # the prediction itself is never stored, and blocks written to other
+        # outputs are not skipped
+        assert not Path(
+            prediction_identifier.container, prediction_identifier.dataset
+        ).exists()
+        outputs.append(
+            ZarrArray.open_from_array_identifier(output_identifier)[output_roi]
+        )
+
+    assert outputs[0].any()
+    np.testing.assert_array_equal(outputs[1], outputs[0])
+
+
+@pytest.mark.parametrize("backend", ["eager", "torchscript", "compile"])
+def test_compile(backend):
+    from dacapo.predict import _compile
+
+    import torch
+
+    torch.manual_seed(0)
+    network = torch.nn.Sequential(
+        torch.nn.Conv3d(1, 3, kernel_size=3), torch.nn.ReLU(), torch.nn.Conv3d(3, 2, 1)
+    )
+    network.eval()
+    x = torch.rand((1, 1, 8, 7, 6))
+
+    with torch.no_grad():
+        compiled = _compile(network, backend, torch.zeros_like(x))
+        assert torch.allclose(compiled(x), network(x), atol=1e-6)
+
+
+def test_compile_cache(tmp_path):
+    from dacapo.predict import _compile
+
+    import torch
+
+    torch.manual_seed(0)
+    x = torch.rand((1, 1, 8, 7, 6))
+    cache_file = tmp_path / "compiled" / "torchscript_cpu_8x7x6.pt"
+
+    with torch.no_grad():
+        network = torch.nn.Conv3d(1, 2, kernel_size=3).eval()
+        traced = _compile(network, "torchscript", torch.zeros_like(x), cache_file)
+        assert cache_file.exists()
+        assert torch.allclose(traced(x), network(x), atol=1e-6)
+
+        # a cached model is loaded instead of tracing the given one again
+        other_network = torch.nn.Conv3d(1, 2, kernel_size=3).eval()
+        loaded = _compile(other_network, "torchscript", torch.zeros_like(x), cache_file)
+        assert torch.allclose(loaded(x), network(x), atol=1e-6)
+        assert not torch.allclose(loaded(x), other_network(x), atol=1e-6)
+
+
+def test_predict_compiled_model_dir(tmp_path):
+    from dacapo.compute_context import LocalTorch
+    from dacapo.experiments.architectures import DummyArchitectureConfig
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray, ZarrArray
+    from dacapo.experiments.model import Model
+    from dacapo.predict import predict
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+    import torch
+
+    architecture_config = DummyArchitectureConfig(
+        name="dummy_architecture", num_in_channels=1, num_out_channels=2
+    )
+    model = Model(
+        architecture_config.architecture_type(architecture_config),
+        torch.nn.Identity(),
+    )
+    raw = NumpyArray.from_np_array(
+        np.random.rand(78, 38, 38).astype(np.float32),
+        Roi((0, 0, 0), (78, 38, 38)),
+        Coordinate(1, 1, 1),
+        ["z", "y", "x"],
+    )
+    output_roi = Roi((1, 1, 1), (76, 36, 36))
+    compiled_model_dir = tmp_path / "compiled"
+
+    def predict_with(backend, dataset):
+        identifier = LocalArrayIdentifier(tmp_path / "test.zarr", dataset)
+        predict(
+            model,
+            raw,
+            identifier,
+            num_cpu_workers=1,
+            compute_context=LocalTorch(device="cpu", inference_backend=backend),
+            output_roi=output_roi,
+            compiled_model_dir=compiled_model_dir,
+        )
+        return ZarrArray.open_from_array_identifier(identifier)[output_roi]
+
+    expected = predict_with("eager", "eager")
+    assert not compiled_model_dir.exists()
+
+    traced = predict_with("torchscript", "traced")
+    np.testing.assert_allclose(traced, expected, atol=1e-6)
+    cache_files = sorted(compiled_model_dir.iterdir())
+    assert len(cache_files) > 0
+    modified = [cache_file.stat().st_mtime_ns for cache_file in cache_files]
+
+    # the traced models are reused by a later prediction
+    cached = predict_with("torchscript", "cached")
+    np.testing.assert_allclose(cached, expected, atol=1e-6)
+    assert sorted(compiled_model_dir.iterdir()) == cache_files
+    assert [cache_file.stat().st_mtime_ns for cache_file in cache_files] == modified
+
+
+@pytest.mark.parametrize("skip", ["mask", "is_empty"])
+@pytest.mark.parametrize("fill_value", [None, 0.5])
+def test_predict_skip_blocks(tmp_path, skip, fill_value):
+    from dacapo.compute_context import LocalTorch
+    from dacapo.experiments.architectures import DummyArchitectureConfig
+    from dacapo.experiments.datasplits.datasets.arrays import NumpyArray, ZarrArray
+    from dacapo.experiments.model import Model
+    from dacapo.predict import predict
+    from dacapo.store.local_array_store import LocalArrayIdentifier
+
+    from funlib.geometry import Coordinate, Roi
+    import numpy as np
+    import torch
+    import zarr
+
+    architecture_config = DummyArchitectureConfig(
+        name="dummy_architecture", num_in_channels=1, num_out_channels=2
+    )
+    model = Model(
+        architecture_config.architecture_type(architecture_config),
+        torch.nn.Identity(),
+    )
+    num_forward_passes = 0
+
+    def count_forward_passes(module, inputs, output):
+        nonlocal num_forward_passes
+        num_forward_passes += 1
+
+    model.register_forward_hook(count_forward_passes)
+
+    # 2x2x2 blocks of 38x18x18 voxels, only the lower half along z contains
+    # anything
+    roi = Roi((0, 0, 0), (78, 38, 38))
+    output_roi = Roi((1, 1, 1), (76, 36, 36))
+    lower = Roi((1, 1, 1), (38, 36, 36))
+    data = np.random.rand(78, 38, 38).astype(np.float32) + 1
+    mask = None
+    is_empty = None
+    if skip == "mask":
+        mask_data = np.zeros((78, 38, 38), dtype=np.uint8)
+        mask_data[:39] = 1
+        mask = NumpyArray.from_np_array(
+            mask_data, roi, Coordinate(1, 1, 1), ["z", "y", "x"]
+        )
+    else:
+        data[38:] = 0
+
+        def all_zero(raw):
+            return not raw.any()
+
+        is_empty = all_zero
+
+    raw = NumpyArray.from_np_array(data, roi, Coordinate(1, 1, 1), ["z", "y", "x"])
+
+    def predict_to(dataset, **kwargs):
+        identifier = LocalArrayIdentifier(tmp_path / "test.zarr", dataset)
+        predict(
+            model,
+            raw,
+            identifier,
+            num_cpu_workers=1,
+            compute_context=LocalTorch(device="cpu"),
+            output_roi=output_roi,
+            **kwargs,
+        )
+        return identifier
+
+    expected = ZarrArray.open_from_array_identifier(predict_to("expected"))
+    num_forward_passes = 0
+    identifier = predict_to(
+        "prediction", mask=mask, is_empty=is_empty, fill_value=fill_value
+    )
+    prediction = ZarrArray.open_from_array_identifier(identifier)
+
+    # only the blocks in the lower half are predicted
+    assert num_forward_passes == 4
+    np.testing.assert_array_equal(prediction[lower], expected[lower])
+    upper = prediction[Roi((39, 1, 1), (38, 36, 36))]
+    dataset = zarr.open(str(identifier.container))[identifier.dataset]
+    if fill_value is None:
+        # skipped blocks are not written at all
+        assert dataset.nchunks_initialized == 4
+        assert (upper == 0).all()
+    else:
+        assert dataset.nchunks_initialized == 8
+        assert (upper == fill_value).all()
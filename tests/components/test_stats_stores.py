@@ -0,0 +1,29 @@
+from ..fixtures import *
+
+
+def test_store_fast_and_full_validation_scores(options):
+    from dacapo.experiments import ValidationScores, ValidationIterationScores
+    from dacapo.store import create_stats_store
+
+    stats_store = create_stats_store()
+    validation_scores = ValidationScores([], [], None)
+
+    # the fast scores of an iteration are stored before its full scores
+    validation_scores.add_iteration_scores(
+        ValidationIterationScores(10, [[[0.5]]], mode="fast")
+    )
+    stats_store.store_validation_iteration_scores("run", validation_scores)
+    validation_scores.add_iteration_scores(
+        ValidationIterationScores(10, [[[0.25]]], mode="full")
+    )
+    stats_store.store_validation_iteration_scores("run", validation_scores)
+
+    stored = stats_store.retrieve_validation_iteration_scores("run")
+    assert sorted((s.iteration, s.mode, s.scores) for s in stored) == [
+        (10, "fast", [[[0.5]]]),
+        (10, "full", [[[0.25]]]),
+    ]
+
+    # storing again does not duplicate scores
+    stats_store.store_validation_iteration_scores("run", validation_scores)
+    assert len(stats_store.retrieve_validation_iteration_scores("run")) == 2
@@ -0,0 +1,152 @@
+import pytest
+
+
+def example_segmentations():
+    import numpy as np
+
+    segmentation = np.array(
+        [[1, 1, 2, 2, 3], [1, 1, 2, 3, 3], [0, 4, 4, 4, 3], [0, 4, 4, 5, 5]],
+        dtype=np.uint32,
+    )
+    ground_truth = np.array(
+        [[1, 1, 1, 2, 2], [1, 1, 1, 2, 2], [0, 3, 3, 3, 2], [0, 0, 3, 3, 3]],
+        dtype=np.uint16,
+    )
+    return segmentation, ground_truth
+
+
+def test_voi_example():
+    from dacapo.utils.voi import split_vi, voi
+
+    segmentation, ground_truth = example_segmentations()
+
+    # split and merge error
+    assert voi(segmentation, ground_truth) == pytest.approx(
+        (0.8605406166523932, 0.16205220600961578)
+    )
+    # merge and split error
+    assert split_vi(segmentation, ground_truth) == pytest.approx(
+        [0.16205220600961578, 0.8605406166523932]
+    )
+    assert split_vi(segmentation, ground_truth, [3], [1]) == pytest.approx(
+        [0.36096404744368116, 0.8264662506490407]
+    )
+
+
+def test_contingency_table_merge():
+    from dacapo.utils.voi import ContingencyTable
+
+    import numpy as np
+
+    rng = np.random.default_rng(42)
+    segmentation = rng.integers(0, 30, size=(20, 30, 40)).astype(np.uint64)
+    ground_truth = (rng.integers(0, 5, size=(20, 30, 40)) * 1000).astype(np.int32)
+
+    whole = ContingencyTable()
+    whole.add(segmentation, ground_truth)
+
+    # the tables of separate blocks, merged in any order
+    blocks = [
+        (slice(z, z + 7), slice(y, y + 11), slice(x, x + 40))
+        for z in range(0, 20, 7)
+        for y in range(0, 30, 11)
+        for x in range(0, 40, 40)
+    ]
+    tables = []
+    for block in blocks:
+        table = ContingencyTable()
+        table.add(segmentation[block], ground_truth[block])
+        tables.append(table)
+    merged = ContingencyTable()
+    for table in reversed(tables):
+        merged.merge(table)
+
+    # a single table accumulated block by block
+    accumulated = ContingencyTable()
+    for block in blocks:
+        accumulated.add(segmentation[block], ground_truth[block])
+
+    for table in (merged, accumulated):
+        np.testing.assert_array_equal(table.segmentation, whole.segmentation)
+        np.testing.assert_array_equal(table.ground_truth, whole.ground_truth)
+        np.testing.assert_array_equal(table.counts, whole.counts)
+        assert table.voi() == pytest.approx(whole.voi())
+        assert table.voi([0], [0, 1000]) == pytest.approx(whole.voi([0], [0, 1000]))
+
+
+@pytest.mark.parametrize(
+    "segmentation_labels, ground_truth_labels",
+    [
+        # large labels
+        ([0, 2**64 - 1, 2**63, 7, 2**40, 8], [0, 2**64 - 2, 3, 2**32]),
+        ([0, 2**62, -(2**62), 7, 2**40, 8], [0, 2**62 + 1, 3, 2**32]),
+        # negative labels
+        ([0, -1, -2, 7, 5, -8], [0, -(2**63), 3, 1]),
+    ],
+)
+def test_contingency_table_labels(segmentation_labels, ground_truth_labels):
+    from dacapo.utils.voi import ContingencyTable, compact_labels
+
+    import numpy as np
+
+    segmentation, ground_truth = example_segmentations()
+    table = ContingencyTable()
+    table.add(segmentation, ground_truth)
+
+    # the same segmentations with other labels
+    def relabel(labels, new_labels):
+        dtype = np.int64 if min(new_labels) < 0 else np.uint64
+        return np.array(new_labels, dtype=dtype)[labels]
+
+    relabelled_segmentation = relabel(segmentation, segmentation_labels)
+    relabelled_ground_truth = relabel(ground_truth, ground_truth_labels)
+
+    unique, ids = compact_labels(relabelled_segmentation)
+    np.testing.assert_array_equal(unique, np.unique(relabelled_segmentation))
+    np.testing.assert_array_equal(unique[ids], relabelled_segmentation.ravel())
+
+    relabelled = ContingencyTable()
+    relabelled.add(relabelled_segmentation, relabelled_ground_truth)
+    assert relabelled.voi(ignore_ground_truth=[ground_truth_labels[0]]) == (
+        pytest.approx(table.voi())
+    )
+    assert relabelled.voi(
+        [segmentation_labels[2]], ground_truth_labels[:2]
+    ) == pytest.approx(table.voi([2], [0, 1]))
+
+
+def test_contingency_table_merge_label_types():
+    from dacapo.utils.voi import ContingencyTable
+
+    import numpy as np
+
+    segmentation, ground_truth = example_segmentations()
+    signed = segmentation.astype(np.int16) - 1
+    whole = ContingencyTable()
+    whole.add(signed, ground_truth)
+
+    # signed and unsigned labels, all labels of the unsigned block fit into
+    # the signed type
+    merged = ContingencyTable()
+    merged.add(signed[:, :1], ground_truth[:, :1])
+    merged.add(signed[:, 1:].astype(np.uint8), ground_truth[:, 1:])
+    assert merged.segmentation.dtype == np.int64
+    assert merged.voi([-1]) == pytest.approx(whole.voi([-1]))
+
+    # signed labels that are not negative and labels too large for a signed
+    # type
+    large_segmentation = segmentation.astype(np.uint64) + np.uint64(2**63)
+    large = ContingencyTable()
+    large.add(large_segmentation, ground_truth)
+    large.add(segmentation.astype(np.int8), ground_truth)
+    assert large.segmentation.dtype == np.uint64
+    expected = ContingencyTable()
+    expected.add(
+        np.concatenate([large_segmentation, segmentation.astype(np.uint64)]),
+        np.concatenate([ground_truth, ground_truth]),
+    )
+    assert large.voi() == pytest.approx(expected.voi())
+
+    # negative labels and labels too large for a signed type
+    with pytest.raises(ValueError):
+        large.merge(whole)
@@ -52,3 +52,259 @@ def test_validate(
     # test validating weights that don't exist
     with pytest.raises(FileNotFoundError):
         validate(run_config.name, 2, compute_context=compute_context)
+
+
+@pytest.mark.parametrize(
+    "run_config",
+    [
+        lazy_fixture("distance_run"),
+        lazy_fixture("onehot_run"),
+    ],
+)
+def test_overlapping_background_validations(
+    options,
+    run_config,
+):
+    from dacapo.experiments.datasplits.datasets.arrays import ZarrArray
+    from dacapo.store import create_array_store, create_stats_store
+    from dacapo.train import _validate_checkpoint
+    from dacapo.validate import merge_validation_scores
+
+    import math
+
+    compute_context = LocalTorch(device="cpu")
+
+    store = create_config_store()
+    weights_store = create_weights_store()
+    stats_store = create_stats_store()
+    array_store = create_array_store()
+
+    store.store_run_config(run_config)
+    run = Run(run_config)
+
+    weights_store.store_weights(run, 1)
+    weights_store.store_weights(run, 2)
+
+    # both validations finish before the scores of either are merged
+    iteration_scores = [
+        _validate_checkpoint(run.name, iteration, compute_context)
+        for iteration in (1, 2)
+    ]
+    assert stats_store.retrieve_validation_iteration_scores(run.name) == []
+
+    for scores in iteration_scores[0] + iteration_scores[1]:
+        merge_validation_scores(run, scores)
+    stats_store.store_validation_iteration_scores(run.name, run.validation_scores)
+
+    stored = stats_store.retrieve_validation_iteration_scores(run.name)
+    assert sorted(scores.iteration for scores in stored) == [1, 2]
+
+    # the best validations are those of the iteration with the best score
+    # over all parameters, the earlier one for ties
+    stored = sorted(stored, key=lambda scores: scores.iteration)
+    for d, dataset in enumerate(run.validation_scores.datasets):
+        for i, criterion in enumerate(run.validation_scores.criteria):
+            sign = (
+                1
+                if run.validation_scores.evaluation_scores.higher_is_better(criterion)
+                else -1
+            )
+            best = [
+                max(
+                    [
+                        sign * parameter_scores[i]
+                        for parameter_scores in scores.scores[d]
+                        if not math.isnan(parameter_scores[i])
+                    ],
+                    default=None,
+                )
+                for scores in stored
+            ]
+            if not run.task.evaluator.store_best(criterion) or best[0] is None:
+                continue
+            best_iteration = 1 if best[1] is None or best[0] >= best[1] else 2
+            best_array = ZarrArray.open_from_array_identifier(
+                array_store.best_validation_array(
+                    run.name, criterion, index=dataset.name
+                )
+            )
+            assert best_array.data.attrs["iteration"] == best_iteration
+
+
+@pytest.mark.parametrize(
+    "run_config",
+    [
+        lazy_fixture("distance_run"),
+        lazy_fixture("onehot_run"),
+    ],
+)
+def test_fused_post_processing(
+    options,
+    run_config,
+):
+    from dacapo.experiments.datasplits.datasets.arrays import ZarrArray
+    from dacapo.experiments.tasks.evaluators import DummyEvaluator
+    from dacapo.store import create_array_store
+    from dacapo.validate import validate_run
+
+    import numpy as np
+
+    compute_context = LocalTorch(device="cpu")
+
+    store = create_config_store()
+    array_store = create_array_store()
+    store.store_run_config(run_config)
+    run = Run(run_config)
+    post_processor = run.task.post_processor
+    assert post_processor.block_local
+
+    # validate the same weights with and without post-processing the
+    # predictions as they are predicted
+    outputs = []
+    for fuse_post_processing in (True, False):
+        validate_run(
+            run,
+            1,
+            compute_context=compute_context,
+            fuse_post_processing=fuse_post_processing,
+            update_stores=False,
+        )
+        outputs.append(
+            [
+                ZarrArray.open_from_array_identifier(
+                    array_store.validation_output_array(
+                        run.name, 1, parameters, dataset
+                    )
+                ).data[:]
+                for dataset in run.datasplit.validate
+                for parameters in post_processor.enumerate_parameters()
+            ]
+        )
+
+    for fused_output, unfused_output in zip(*outputs):
+        assert fused_output.dtype == unfused_output.dtype
+        np.testing.assert_array_equal(fused_output, unfused_output)
+
+    fused, unfused = run.validation_scores.scores
+    assert (fused.iteration, fused.mode) == (unfused.iteration, unfused.mode)
+    # the dummy evaluator scores randomly
+    if not isinstance(run.task.evaluator, DummyEvaluator):
+        np.testing.assert_array_equal(
+            np.array(fused.scores, dtype=np.float64),
+            np.array(unfused.scores, dtype=np.float64),
+        )
+
+
+@pytest.mark.parametrize(
+    "run_config",
+    [
+        lazy_fixture("distance_run"),
+    ],
+)
+@pytest.mark.parametrize("fuse_post_processing", [True, False])
+def test_validate_workers(
+    options,
+    run_config,
+    fuse_post_processing,
+):
+    from dacapo.validate import validate_run
+
+    import numpy as np
+
+    compute_context = LocalTorch(device="cpu")
+
+    store = create_config_store()
+    store.store_run_config(run_config)
+    run = Run(run_config)
+
+    # sweeping over the post-processor parameters in worker processes gives
+    # the same scores as sweeping in this process
+    for num_workers in (1, 2):
+        validate_run(
+            run,
+            1,
+            compute_context=compute_context,
+            fuse_post_processing=fuse_post_processing,
+            num_workers=num_workers,
+            update_stores=False,
+        )
+
+    single, multiple = run.validation_scores.scores
+    assert (single.iteration, single.mode) == (multiple.iteration, multiple.mode)
+    np.testing.assert_array_equal(
+        np.array(single.scores, dtype=np.float64),
+        np.array(multiple.scores, dtype=np.float64),
+    )
+
+
+@pytest.mark.parametrize(
+    "run_config",
+    [
+        lazy_fixture("distance_run"),
+    ],
+)
+def test_validation_input_cache(
+    options,
+    run_config,
+):
+    from dacapo.store import create_array_store
+    from dacapo.validate import validate_run
+
+    import attr
+    from pathlib import Path
+
+    compute_context = LocalTorch(device="cpu")
+
+    store = create_config_store()
+    array_store = create_array_store()
+
+    # two runs validating on the same data
+    runs = []
+    for name in (run_config.name, f"{run_config.name}_copy"):
+        config = attr.evolve(run_config, name=name)
+        store.store_run_config(config)
+        runs.append(Run(config))
+
+    def input_paths(run):
+        return [
+            Path(identifier.container, identifier.dataset)
+            for dataset in run.datasplit.validate
+            for identifier in array_store.validation_input_arrays(
+                run.name, dataset.name
+            )
+        ]
+
+    cache_files = {}
+    for run in runs:
+        validate_run(run, 1, compute_context=compute_context, update_stores=False)
+        if not cache_files:
+            # the inputs of the first run are cached
+            cache_paths = [path.resolve() for path in input_paths(run)]
+            cache_files = {
+                path: path.stat().st_mtime_ns
+                for cache_path in cache_paths
+                for path in cache_path.rglob("*")
+            }
+
+        # and linked, for every run
+        for path, cache_path in zip(input_paths(run), cache_paths):
+            assert path.is_symlink()
+            assert path.resolve() == cache_path
+
+    # the second run reuses the cached copies without writing them again
+    assert cache_files
+    for path, mtime in cache_files.items():
+        assert path.stat().st_mtime_ns == mtime
+
+    # removing the inputs of a run removes the links, not the cached copies
+    first, second = runs
+    for dataset in first.datasplit.validate:
+        for identifier in array_store.validation_input_arrays(first.name, dataset.name):
+            array_store.remove(identifier)
+    for path, cache_path in zip(input_paths(first), cache_paths):
+        assert not path.is_symlink() and not path.exists()
+        assert cache_path.is_dir()
+    for path in input_paths(second):
+        assert path.resolve().is_dir()
+    for path, mtime in cache_files.items():
+        assert path.stat().st_mtime_ns == mtime